@@ -0,0 +1,125 @@
+"""Adjuntos en S3: subida desde el scraper y URLs firmadas para la API.
+
+El bucket es privado. En la base de datos se guarda la URL canónica de
+cada objeto (url_s3, url_thumb, url_medium) y la API redirige a una URL
+firmada generada al vuelo, que se reutiliza mientras le quede vida.
+"""
+import os
+import threading
+import time
+from urllib.parse import unquote, urlparse
+
+import metricas
+from metricas import cronometro
+
+# Configuración AWS S3
+AWS_ACCESS_KEY = os.getenv('AWS_ACCESS_KEY')
+AWS_SECRET_KEY = os.getenv('AWS_SECRET_KEY')
+AWS_BUCKET = os.getenv('AWS_BUCKET', 'auctionbrokers-files')
+AWS_REGION = os.getenv('AWS_REGION', 'eu-west-3')
+# Endpoint alternativo compatible con S3 (benchmarks, MinIO...)
+AWS_ENDPOINT_URL = os.getenv('AWS_ENDPOINT_URL')
+
+# Validez de las URLs firmadas, en segundos
+URL_FIRMADA_TTL = int(os.getenv('ADJUNTOS_URL_TTL', 3600))
+# Se reutilizan durante la mitad de su vida, así el navegador siempre
+# recibe una URL con margen de sobra
+_REUSO_URL = URL_FIRMADA_TTL / 2
+_MAX_CACHE = 20000
+
+_s3_client = None
+_cache_urls = {}
+_lock = threading.Lock()
+
+def cliente_s3():
+    """Cliente de S3, creado en el primer uso: importar boto3 y crearlo
+    cuesta más que arrancar el resto de la API"""
+    global _s3_client
+    if _s3_client is None:
+        with _lock:
+            if _s3_client is None:
+                import boto3
+                from botocore.config import Config
+                _s3_client = boto3.client(
+                    's3',
+                    aws_access_key_id=AWS_ACCESS_KEY,
+                    aws_secret_access_key=AWS_SECRET_KEY,
+                    region_name=AWS_REGION,
+                    endpoint_url=AWS_ENDPOINT_URL,
+                    config=Config(s3={'addressing_style': 'path'}) if AWS_ENDPOINT_URL else None
+                )
+    return _s3_client
+
+def url_canonica(clave):
+    """URL (no pública) de un objeto del bucket, la que se guarda en la base de datos"""
+    if AWS_ENDPOINT_URL:
+        return f"{AWS_ENDPOINT_URL}/{AWS_BUCKET}/{clave}"
+    return f"https://{AWS_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{clave}"
+
+def clave_desde_url(url):
+    """Clave del objeto a partir de su URL canónica, o None si no es del bucket"""
+    if not url:
+        return None
+    partes = urlparse(url)
+    ruta = unquote(partes.path).lstrip('/')
+    if partes.netloc.startswith(f"{AWS_BUCKET}."):
+        return ruta or None
+    if ruta.startswith(f"{AWS_BUCKET}/"):
+        return ruta[len(AWS_BUCKET) + 1:] or None
+    return None
+
+def subir_bytes(contenido, clave, content_type='application/octet-stream'):
+    """Subir un objeto desde memoria. Devuelve su URL canónica o None"""
+    try:
+        with cronometro('s3_subida'):
+            cliente_s3().put_object(
+                Bucket=AWS_BUCKET,
+                Key=clave,
+                Body=contenido,
+                ContentType=content_type
+            )
+        metricas.incrementar('s3_bytes', len(contenido))
+        return url_canonica(clave)
+    except Exception as e:
+        print(f"❌ Error subiendo a S3: {e}")
+        return None
+
+def subir_fichero(ruta_local, clave, content_type='application/octet-stream'):
+    """Subir un fichero en disco, por partes si es grande"""
+    try:
+        with cronometro('s3_subida'):
+            cliente_s3().upload_file(
+                ruta_local, AWS_BUCKET, clave,
+                ExtraArgs={'ContentType': content_type}
+            )
+        metricas.incrementar('s3_bytes', os.path.getsize(ruta_local))
+        return url_canonica(clave)
+    except Exception as e:
+        print(f"❌ Error subiendo a S3: {e}")
+        return None
+
+def url_firmada(clave):
+    """URL temporal de descarga de un objeto, cacheada mientras sea válida.
+
+    Devuelve (url, segundos que el cliente puede reutilizarla).
+    """
+    ahora = time.monotonic()
+    with _lock:
+        entrada = _cache_urls.get(clave)
+        if entrada and entrada[1] > ahora:
+            return entrada[0], int(entrada[1] - ahora)
+
+    # Firmar es local (sin red), pero no hace falta hacerlo con el lock
+    url = cliente_s3().generate_presigned_url(
+        'get_object',
+        Params={'Bucket': AWS_BUCKET, 'Key': clave},
+        ExpiresIn=URL_FIRMADA_TTL
+    )
+    with _lock:
+        if len(_cache_urls) >= _MAX_CACHE:
+            for vieja in [c for c, (_, caduca) in _cache_urls.items() if caduca <= ahora]:
+                del _cache_urls[vieja]
+            if len(_cache_urls) >= _MAX_CACHE:
+                _cache_urls.clear()
+        _cache_urls[clave] = (url, ahora + _REUSO_URL)
+    return url, int(_REUSO_URL)
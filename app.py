@@ -1,25 +1,48 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, redirect, request, send_file
 from flask_cors import CORS
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
+import itertools
 import os
+import threading
+import time
 from datetime import datetime
 from database import (
-    init_database, obtener_subastas, obtener_imagenes_subasta,
-    obtener_documentos_subasta, get_db_connection
+    obtener_subastas_json, obtener_subasta_detalle,
+    obtener_estadisticas, obtener_oportunidades, obtener_url_adjunto, obtener_cambios_json,
+    get_db_connection, COLUMNAS_CALCULADAS
 )
-from scraper import scraping_completo
-import threading
+from almacenamiento import clave_desde_url, url_firmada
+from exportacion import (
+    FORMATOS, crear_libro_excel, filas_excel, generar_csv, generar_ndjson_gz, generar_parquet
+)
+from serializacion import respuesta_json, respuesta_json_cruda, serializar_subasta
+from tareas import (
+    encolar_scraping, obtener_estado_scraping, cancelar_scraping, obtener_metricas_scraping
+)
+from metricas import formato_prometheus
+import catalogo
+import notificaciones
+import perfilado
+from perfilado import seccion
 
 app = Flask(__name__)
 CORS(app)
+perfilado.instalar(app)
+
+# URL guardada de cada adjunto ya consultado: (tipo, id, variante) -> url
+_urls_adjuntos = {}
 
-# Inicializar base de datos al arrancar
-try:
-    init_database()
-except Exception as e:
-    print(f"⚠️ Error inicializando base de datos: {e}")
+# Streams SSE abiertos a la vez por proceso. Con gthread cada uno ocupa un
+# hilo, así que por defecto solo se deja una cuarta parte de los hilos para
+# streams y el resto sigue atendiendo el listado; con gevent son greenlets
+if os.getenv('GUNICORN_WORKER_CLASS', 'gthread') == 'gevent':
+    _MAX_STREAMS_DEFECTO = 500
+else:
+    _MAX_STREAMS_DEFECTO = max(1, int(os.getenv('GUNICORN_THREADS', 8)) // 4)
+MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', _MAX_STREAMS_DEFECTO))
+# Cada stream se cierra pasado este tiempo; el navegador reconecta solo
+# (con Last-Event-ID), así que los hilos van rotando entre los clientes
+DURACION_STREAM = int(os.getenv('SSE_DURACION_SEGUNDOS', 300))
+_plazas_streams = threading.BoundedSemaphore(MAX_STREAMS)
 
 @app.route('/')
 def home():
@@ -30,17 +53,24 @@ def home():
         "endpoints": [
             "/api/health",
             "/api/subastas",
+            "/api/subastas/changes?since=<cursor>",
+            "/api/subastas/stream?since=<cursor>",
             "/api/subasta/<id>",
+            "/api/adjuntos/<tipo>/<id>",
             "/api/exportar",
+            "/api/oportunidades",
             "/api/stats",
-            "/api/scraping/iniciar"
+            "/api/scraping/iniciar",
+            "/api/scraping/estado",
+            "/api/scraping/cancelar",
+            "/api/scraping/metrics"
         ]
     })
 
 @app.route('/api/health')
 def health():
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(solo_lectura=True)
         cur = conn.cursor()
         cur.execute('SELECT COUNT(*) as total FROM subastas')
         result = cur.fetchone()
@@ -61,80 +91,51 @@ def health():
             "error": str(e)
         }), 500
 
+def leer_filtros(origen):
+    """Filtros del listado a partir de los parámetros de la URL o del cuerpo JSON"""
+    filtros = {}
+    if origen.get('provincia'):
+        filtros['provincia'] = origen['provincia']
+    if origen.get('tipo'):
+        filtros['tipo_bien'] = origen['tipo']
+    if origen.get('search'):
+        filtros['search'] = origen['search']
+    # Búsqueda de texto completo en los PDFs (edictos, tasaciones...)
+    if origen.get('documentos'):
+        filtros['texto_documentos'] = origen['documentos']
+    # Lotes: texto de su descripción y rango de su valor de subasta
+    if origen.get('lote'):
+        filtros['texto_lotes'] = origen['lote']
+    for limite in ('min_valor_lote', 'max_valor_lote'):
+        if origen.get(limite) not in (None, ''):
+            filtros[limite] = float(origen[limite])
+    if str(origen.get('incluir_archivo', '')) in ('1', 'true', 'True'):
+        filtros['incluir_archivo'] = True
+    # Orden y rangos de los ratios calculados (?sort=ratio1&orden=asc&max_ratio1=50)
+    if origen.get('sort'):
+        filtros['sort'] = origen['sort']
+    if origen.get('orden'):
+        filtros['orden'] = origen['orden']
+    for columna in COLUMNAS_CALCULADAS:
+        for limite in (f'min_{columna}', f'max_{columna}'):
+            if origen.get(limite) not in (None, ''):
+                filtros[limite] = float(origen[limite])
+    return filtros
+
 @app.route('/api/subastas')
 def get_subastas():
     try:
-        provincia = request.args.get('provincia', '')
-        tipo = request.args.get('tipo', '')
-        search = request.args.get('search', '')
-        
-        filtros = {}
-        if provincia:
-            filtros['provincia'] = provincia
-        if tipo:
-            filtros['tipo_bien'] = tipo
-        if search:
-            filtros['search'] = search
-        
-        resultados = obtener_subastas(filtros)
-        
-        # Convertir resultados a formato JSON serializable
-        subastas = []
-        for subasta in resultados:
-            subasta_dict = dict(subasta)
-            
-            # Convertir fechas a string
-            if subasta_dict.get('fecha_inicio'):
-                subasta_dict['fecha_inicio'] = subasta_dict['fecha_inicio'].isoformat()
-            if subasta_dict.get('fecha_conclusion'):
-                subasta_dict['fecha_conclusion'] = subasta_dict['fecha_conclusion'].isoformat()
-            if subasta_dict.get('fecha_scraping'):
-                subasta_dict['fecha_scraping'] = subasta_dict['fecha_scraping'].isoformat()
-            if subasta_dict.get('actualizado'):
-                subasta_dict['actualizado'] = subasta_dict['actualizado'].isoformat()
-            
-            # Convertir Decimal a float
-            for key in ['cantidad_reclamada', 'valor_tasacion', 'valor_subasta', 
-                       'tramos_pujas', 'puja_minima', 'puja_maxima', 'importe_deposito',
-                       'latitud', 'longitud']:
-                if subasta_dict.get(key) is not None:
-                    subasta_dict[key] = float(subasta_dict[key])
-            
-            # Agregar coordenadas en formato esperado por el frontend
-            if subasta_dict.get('latitud') and subasta_dict.get('longitud'):
-                subasta_dict['coordenadas'] = {
-                    'lat': float(subasta_dict['latitud']),
-                    'lng': float(subasta_dict['longitud'])
-                }
-            
-            # Obtener imágenes y documentos
-            imagenes = obtener_imagenes_subasta(subasta_dict['id'])
-            documentos = obtener_documentos_subasta(subasta_dict['id'])
-            
-            subasta_dict['imagenes'] = [
-                {
-                    'nombre': img['nombre'],
-                    'url': img['url_s3'] or img['url_original']
-                }
-                for img in imagenes
-            ]
-            
-            subasta_dict['documentos'] = [
-                {
-                    'nombre': doc['nombre'],
-                    'url': doc['url_s3'] or doc['url_original'],
-                    'size': f"{doc['size_bytes'] / 1024:.0f} KB" if doc['size_bytes'] else "N/A"
-                }
-                for doc in documentos
-            ]
-            
-            subastas.append(subasta_dict)
-        
-        return jsonify({
-            "success": True,
-            "data": subastas,
-            "total": len(subastas)
-        })
+        filtros = leer_filtros(request.args)
+        
+        # Con CATALOGO_MEMORIA=1 responde la instantánea en memoria si puede;
+        # si no, PostgreSQL genera el documento completo, con imágenes y documentos
+        payload = catalogo.listado_json(filtros)
+        if payload is None:
+            payload = obtener_subastas_json(filtros)
+        return respuesta_json_cruda(payload)
+    
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Filtro no válido: {e}"}), 400
         
     except Exception as e:
         return jsonify({
@@ -142,91 +143,147 @@ def get_subastas():
             "error": str(e)
         }), 500
 
+@app.route('/api/subastas/changes')
+def get_cambios_subastas():
+    """Cambios desde el cursor `since` (el 'cursor' del listado o de la llamada anterior)"""
+    try:
+        desde = request.args.get('since', 0, type=int)
+        limite = min(max(request.args.get('limite', 500, type=int), 1), 5000)
+        payload, _, _ = obtener_cambios_json(desde, limite)
+        return respuesta_json_cruda(payload)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/subastas/stream')
+def stream_cambios_subastas():
+    """Server-Sent Events con los cambios posteriores a `since` (o a Last-Event-ID).
+
+    Si ya hay MAX_STREAMS abiertos en este proceso responde 503 y el cliente
+    pasa a consultar /api/subastas/changes.
+    """
+    desde = request.headers.get('Last-Event-ID', type=int)
+    if desde is None:
+        desde = request.args.get('since', 0, type=int)
+    if not _plazas_streams.acquire(blocking=False):
+        return jsonify({
+            "success": False,
+            "error": "Demasiados streams abiertos, usa /api/subastas/changes"
+        }), 503, {'Retry-After': '60'}
+    notificaciones.iniciar()
+    
+    def eventos(cursor):
+        fin = time.monotonic() + DURACION_STREAM
+        yield 'retry: 5000\n\n'
+        while time.monotonic() < fin:
+            # Se lee del primario: el aviso llega antes que la réplica
+            payload, nuevo_cursor, mas = obtener_cambios_json(cursor, solo_lectura=False)
+            if nuevo_cursor > cursor:
+                cursor = nuevo_cursor
+                yield f'id: {cursor}\nevent: cambios\ndata: {payload}\n\n'
+                if mas:
+                    continue
+            if not notificaciones.esperar(cursor, min(25, max(0, fin - time.monotonic()))):
+                # Latido para que proxies y balanceadores no corten la conexión
+                yield ': ping\n\n'
+    
+    liberada = threading.Event()
+    
+    def liberar():
+        # La plaza se devuelve al cerrar la respuesta, haya empezado o no el generador
+        if not liberada.is_set():
+            liberada.set()
+            _plazas_streams.release()
+    
+    try:
+        respuesta = Response(eventos(desde), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        respuesta.call_on_close(liberar)
+        return respuesta
+    except Exception:
+        liberar()
+        raise
+
 @app.route('/api/subasta/<subasta_id>')
 def get_subasta_detalle(subasta_id):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        detalle = obtener_subasta_detalle(subasta_id)
         
-        cur.execute('SELECT * FROM subastas WHERE id = %s', (subasta_id,))
-        subasta = cur.fetchone()
-        
-        if not subasta:
+        if not detalle:
             return jsonify({"success": False, "error": "Subasta no encontrada"}), 404
         
-        # Convertir a dict y preparar datos
-        subasta_dict = dict(subasta)
-        
-        # Convertir fechas
-        if subasta_dict.get('fecha_inicio'):
-            subasta_dict['fecha_inicio'] = subasta_dict['fecha_inicio'].isoformat()
-        if subasta_dict.get('fecha_conclusion'):
-            subasta_dict['fecha_conclusion'] = subasta_dict['fecha_conclusion'].isoformat()
-        
-        # Obtener imágenes y documentos
-        imagenes = obtener_imagenes_subasta(subasta_id)
-        documentos = obtener_documentos_subasta(subasta_id)
+        with seccion('serializacion'):
+            subasta_dict = serializar_subasta(detalle['subasta'])
+            subasta_dict['imagenes'] = [
+                dict(img, url=f"/api/adjuntos/imagen/{img['id']}") for img in detalle['imagenes']
+            ]
+            subasta_dict['documentos'] = [
+                dict(doc, url=f"/api/adjuntos/documento/{doc['id']}") for doc in detalle['documentos']
+            ]
+            subasta_dict['lotes_detalle'] = detalle['lotes']
+            subasta_dict['archivada'] = detalle['archivada']
         
-        subasta_dict['imagenes'] = [dict(img) for img in imagenes]
-        subasta_dict['documentos'] = [dict(doc) for doc in documentos]
+        return respuesta_json({"success": True, "data": subasta_dict})
         
-        cur.close()
-        conn.close()
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/adjuntos/<tipo>/<int:adjunto_id>')
+def redirigir_adjunto(tipo, adjunto_id):
+    """Redirigir a una URL firmada de la imagen (?variante=thumb|medium) o documento"""
+    if tipo not in ('imagen', 'documento'):
+        return jsonify({"success": False, "error": "Tipo de adjunto no válido"}), 404
+    
+    try:
+        variante = request.args.get('variante')
+        clave_cache = (tipo, adjunto_id, variante)
+        url = _urls_adjuntos.get(clave_cache)
+        if url is None:
+            url = obtener_url_adjunto(tipo, adjunto_id, variante)
+            if not url:
+                return jsonify({"success": False, "error": "Adjunto no encontrado"}), 404
+            if len(_urls_adjuntos) >= 20000:
+                _urls_adjuntos.clear()
+            _urls_adjuntos[clave_cache] = url
+        
+        clave = clave_desde_url(url)
+        if clave:
+            destino, segundos = url_firmada(clave)
+        else:
+            # Adjunto que no llegó a subirse: el original del BOE
+            destino, segundos = url, 86400
         
-        return jsonify({"success": True, "data": subasta_dict})
+        respuesta = redirect(destino, 302)
+        respuesta.headers['Cache-Control'] = f'private, max-age={segundos}'
+        return respuesta
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/oportunidades')
+def get_oportunidades():
+    """Subastas abiertas con mayor descuento sobre su tasación"""
+    try:
+        limite = min(max(request.args.get('limite', 50, type=int), 1), 500)
+        oportunidades = obtener_oportunidades(
+            limite,
+            provincia=request.args.get('provincia') or None,
+            tipo_bien=request.args.get('tipo') or None
+        )
+        return respuesta_json({"success": True, "data": oportunidades, "total": len(oportunidades)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/stats')
 def get_stats():
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Total subastas
-        cur.execute('SELECT COUNT(*) as total FROM subastas')
-        total = cur.fetchone()['total']
-        
-        # Por provincia
-        cur.execute('''
-            SELECT provincia, COUNT(*) as cantidad
-            FROM subastas
-            GROUP BY provincia
-            ORDER BY cantidad DESC
-            LIMIT 10
-        ''')
-        por_provincia = [dict(row) for row in cur.fetchall()]
-        
-        # Por tipo de bien
-        cur.execute('''
-            SELECT tipo_bien, COUNT(*) as cantidad
-            FROM subastas
-            GROUP BY tipo_bien
-            ORDER BY cantidad DESC
-        ''')
-        por_tipo = [dict(row) for row in cur.fetchall()]
-        
-        # Por estado
-        cur.execute('''
-            SELECT estado, COUNT(*) as cantidad
-            FROM subastas
-            GROUP BY estado
-            ORDER BY cantidad DESC
-        ''')
-        por_estado = [dict(row) for row in cur.fetchall()]
-        
-        cur.close()
-        conn.close()
-        
+        stats = catalogo.estadisticas()
+        if stats is None:
+            stats = obtener_estadisticas()
         return jsonify({
             "success": True,
-            "stats": {
-                "total": total,
-                "por_provincia": por_provincia,
-                "por_tipo": por_tipo,
-                "por_estado": por_estado
-            }
+            "stats": stats
         })
         
     except Exception as e:
@@ -235,148 +292,46 @@ def get_stats():
 @app.route('/api/exportar', methods=['POST'])
 def exportar_excel():
     try:
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         ids = data.get('ids', [])
-        
-        if not ids:
-            # Exportar todas
-            subastas_exportar = obtener_subastas()
-        else:
-            # Exportar seleccionadas
-            conn = get_db_connection()
-            cur = conn.cursor()
-            placeholders = ','.join(['%s'] * len(ids))
-            cur.execute(f'SELECT * FROM subastas WHERE id IN ({placeholders})', ids)
-            subastas_exportar = cur.fetchall()
-            cur.close()
-            conn.close()
-        
-        # Crear Excel
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Subastas BOE"
-        
-        # Estilos
-        header_fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        
-        # Encabezados
-        headers = [
-            "RATIO 1 - cantidad reclamada vs valor subasta",
-            "RATIO 2 - Puja Máxima vs Valor Subasta",
-            "Estado",
-            "Tipo De Subasta",
-            "Tipo Bien",
-            "Id",
-            "Lotes",
-            "Provincia",
-            "Localidad",
-            "Dirección",
-            "Boton google maps",
-            "Descripción",
-            "Referencia Catastral",
-            "Marca",
-            "Modelo",
-            "Matricula",
-            "Cantidad Reclamada",
-            "Valor De Tasacion",
-            "Valor Subasta",
-            "Tramos Entre Pujas",
-            "Puja Mínima",
-            "Puja Máxima",
-            "Importe Del Deposito",
-            "Nombre",
-            "Fecha De Inicio",
-            "Fecha De Conclusión"
-        ]
-        
-        # Escribir encabezados
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
-        
-        # Escribir datos
-        for row_num, subasta in enumerate(subastas_exportar, 2):
-            subasta_dict = dict(subasta)
-            
-            google_maps_url = ""
-            if subasta_dict.get('latitud') and subasta_dict.get('longitud'):
-                lat = float(subasta_dict['latitud'])
-                lng = float(subasta_dict['longitud'])
-                google_maps_url = f"https://www.google.com/maps/search/?api=1&query={lat},{lng}"
-            
-            # RATIO 1
-            ws.cell(row=row_num, column=1).value = f"=IF(Q{row_num}=0,0,(Q{row_num}/S{row_num})*100)"
-            ws.cell(row=row_num, column=1).number_format = '0.00"%"'
-            
-            # RATIO 2
-            ws.cell(row=row_num, column=2).value = f"=IF(V{row_num}=0,0,(V{row_num}/S{row_num})*100)"
-            ws.cell(row=row_num, column=2).number_format = '0.00"%"'
-            
-            # Resto de columnas
-            ws.cell(row=row_num, column=3).value = subasta_dict.get('estado', '')
-            ws.cell(row=row_num, column=4).value = subasta_dict.get('tipo_subasta', '')
-            ws.cell(row=row_num, column=5).value = subasta_dict.get('tipo_bien', '')
-            ws.cell(row=row_num, column=6).value = subasta_dict.get('id', '')
-            ws.cell(row=row_num, column=7).value = subasta_dict.get('lotes', '')
-            ws.cell(row=row_num, column=8).value = subasta_dict.get('provincia', '')
-            ws.cell(row=row_num, column=9).value = subasta_dict.get('localidad', '')
-            ws.cell(row=row_num, column=10).value = subasta_dict.get('direccion', '')
-            
-            if google_maps_url:
-                cell = ws.cell(row=row_num, column=11)
-                cell.value = "Ver en Google Maps"
-                cell.hyperlink = google_maps_url
-                cell.font = Font(color="0563C1", underline="single")
-            
-            ws.cell(row=row_num, column=12).value = subasta_dict.get('descripcion', '')
-            ws.cell(row=row_num, column=13).value = subasta_dict.get('referencia_catastral', '')
-            ws.cell(row=row_num, column=14).value = subasta_dict.get('marca', '')
-            ws.cell(row=row_num, column=15).value = subasta_dict.get('modelo', '')
-            ws.cell(row=row_num, column=16).value = subasta_dict.get('matricula', '')
-            ws.cell(row=row_num, column=17).value = float(subasta_dict.get('cantidad_reclamada', 0) or 0)
-            ws.cell(row=row_num, column=18).value = float(subasta_dict.get('valor_tasacion', 0) or 0)
-            ws.cell(row=row_num, column=19).value = float(subasta_dict.get('valor_subasta', 0) or 0)
-            ws.cell(row=row_num, column=20).value = float(subasta_dict.get('tramos_pujas', 0) or 0)
-            ws.cell(row=row_num, column=21).value = float(subasta_dict.get('puja_minima', 0) or 0)
-            ws.cell(row=row_num, column=22).value = float(subasta_dict.get('puja_maxima', 0) or 0)
-            ws.cell(row=row_num, column=23).value = float(subasta_dict.get('importe_deposito', 0) or 0)
-            ws.cell(row=row_num, column=24).value = subasta_dict.get('nombre_acreedor', '')
-            
-            # Fechas
-            fecha_inicio = subasta_dict.get('fecha_inicio')
-            if fecha_inicio:
-                ws.cell(row=row_num, column=25).value = fecha_inicio.strftime('%d/%m/%Y') if hasattr(fecha_inicio, 'strftime') else str(fecha_inicio)
-            
-            fecha_conclusion = subasta_dict.get('fecha_conclusion')
-            if fecha_conclusion:
-                ws.cell(row=row_num, column=26).value = fecha_conclusion.strftime('%d/%m/%Y') if hasattr(fecha_conclusion, 'strftime') else str(fecha_conclusion)
-        
-        # Ajustar anchos de columna
-        column_widths = [35, 35, 12, 15, 12, 18, 15, 12, 15, 40, 20, 50, 25, 15, 15, 12, 18, 18, 15, 18, 15, 15, 18, 40, 15, 18]
-        for col_num, width in enumerate(column_widths, 1):
-            ws.column_dimensions[get_column_letter(col_num)].width = width
-        
-        # Congelar primera fila
-        ws.freeze_panes = "A2"
-        
-        # Añadir filtros
-        ws.auto_filter.ref = ws.dimensions
+        formato = data.get('formato') or request.args.get('formato', 'xlsx')
+        if formato not in FORMATOS:
+            return jsonify({'success': False, 'error': f'Formato no soportado: {formato}'}), 400
+        
+        # Mismos filtros que el listado, en el cuerpo o en la URL
+        try:
+            filtros = leer_filtros(data) or leer_filtros(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f'Filtro no válido: {e}'}), 400
+        mimetype, extension = FORMATOS[formato]
+        nombre_descarga = f'subastas_boe_{datetime.now().strftime("%Y%m%d")}.{extension}'
+        
+        if formato != 'xlsx':
+            generadores = {'csv': generar_csv, 'parquet': generar_parquet, 'ndjson': generar_ndjson_gz}
+            bloques = generadores[formato](filtros, ids)
+            # El primer bloque abre la consulta: si falla, aún podemos devolver un 500
+            primero = next(bloques)
+            return Response(
+                itertools.chain([primero], bloques),
+                mimetype=mimetype,
+                headers={'Content-Disposition': f'attachment; filename={nombre_descarga}'}
+            )
+        
+        with seccion('excel'):
+            # Misma consulta (filtros, archivo, ids) que el resto de formatos
+            wb = crear_libro_excel(filas_excel(filtros, ids))
         
         # Guardar archivo temporal
         os.makedirs('temp', exist_ok=True)
         filename = f'temp/subastas_boe_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        wb.save(filename)
+        with seccion('excel_guardar'):
+            wb.save(filename)
         
         return send_file(
             filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            mimetype=mimetype,
             as_attachment=True,
-            download_name=f'subastas_boe_{datetime.now().strftime("%Y%m%d")}.xlsx'
+            download_name=nombre_descarga
         )
     
     except Exception as e:
@@ -384,15 +339,22 @@ def exportar_excel():
 
 @app.route('/api/scraping/iniciar', methods=['POST'])
 def iniciar_scraping():
-    """Iniciar scraping en segundo plano"""
+    """Encolar un scraping; lo ejecuta el proceso worker (tareas.py)"""
     try:
-        # Ejecutar scraping en un thread separado
-        thread = threading.Thread(target=scraping_completo)
-        thread.daemon = True
-        thread.start()
+        data = request.get_json(silent=True) or {}
+        tipo = 'incremental' if data.get('tipo') == 'incremental' else 'completo'
+        
+        ejecucion_id = encolar_scraping(tipo)
+        if ejecucion_id is None:
+            return respuesta_json({
+                "success": False,
+                "error": "Ya hay un scraping pendiente o en curso",
+                "ejecucion": obtener_estado_scraping()
+            }, 409)
         
         return jsonify({
             "success": True,
+            "id": ejecucion_id,
             "message": "Scraping iniciado en segundo plano. Puede tardar varias horas."
         })
     except Exception as e:
@@ -401,6 +363,56 @@ def iniciar_scraping():
             "error": str(e)
         }), 500
 
+@app.route('/api/scraping/estado')
+def estado_scraping():
+    try:
+        return respuesta_json({"success": True, "ejecucion": obtener_estado_scraping()})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/scraping/cancelar', methods=['POST'])
+def cancelar_scraping_actual():
+    try:
+        ejecucion_id = cancelar_scraping()
+        if ejecucion_id is None:
+            return jsonify({"success": False, "error": "No hay ningún scraping activo"}), 404
+        
+        return jsonify({
+            "success": True,
+            "id": ejecucion_id,
+            "message": "Cancelación solicitada"
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/scraping/metrics')
+def metricas_scraping():
+    """Métricas por etapa de la última ejecución (JSON o ?format=prometheus)"""
+    try:
+        ejecucion = obtener_metricas_scraping()
+        datos = ejecucion['metricas'] if ejecucion else {}
+        
+        if request.args.get('format') == 'prometheus':
+            return Response(formato_prometheus(datos), mimetype='text/plain; version=0.0.4')
+        
+        return respuesta_json({
+            "success": True,
+            "ejecucion": {"id": ejecucion['id'], "estado": ejecucion['estado']} if ejecucion else None,
+            "metricas": datos
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/debug/perf')
+def debug_perf():
+    """Tiempos por petición, consultas lentas y perfiles de este proceso"""
+    if not perfilado.PERF_ACTIVO:
+        return jsonify({"success": False, "error": "Perfilado desactivado (PERF_ENABLED=1)"}), 404
+    return respuesta_json({"success": True, "perf": perfilado.informe()})
+
 if __name__ == '__main__':
+    # En local no hay fase release: migrar al arrancar el servidor de desarrollo
+    from migraciones import migrar
+    migrar()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,106 @@
+"""Pruebas de carga de /api/subastas, /api/stats y /api/exportar.
+
+Sin --url arranca app.py en este proceso (servidor multihilo de werkzeug)
+contra la base de datos de DATABASE_URL; con --url mide un despliegue
+ya levantado (gunicorn, el dyno de pruebas...).
+
+Uso: python benchmarks/bench_api.py --peticiones 200 --concurrencia 8
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (nombre, método, ruta, cuerpo, peticiones relativas)
+ESCENARIOS = [
+    ('subastas', 'GET', '/api/subastas', None, 1.0),
+    ('subastas_provincia', 'GET', '/api/subastas?provincia=Madrid', None, 1.0),
+    ('subastas_busqueda', 'GET', '/api/subastas?search=garaje', None, 0.5),
+    ('subastas_lote', 'GET', '/api/subastas?lote=garaje&min_valor_lote=50000', None, 0.5),
+    ('stats', 'GET', '/api/stats', None, 1.0),
+    ('exportar_xlsx', 'POST', '/api/exportar', {'formato': 'xlsx'}, 0.02),
+    ('exportar_csv', 'POST', '/api/exportar', {'formato': 'csv'}, 0.02),
+    ('exportar_parquet', 'POST', '/api/exportar', {'formato': 'parquet'}, 0.02),
+    ('exportar_ndjson', 'POST', '/api/exportar', {'formato': 'ndjson'}, 0.02),
+]
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    indice = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return round(valores[indice], 2)
+
+def cargar(url_base, metodo, ruta, cuerpo=None, peticiones=100, concurrencia=8):
+    """Lanzar peticiones concurrentes y devolver latencias y throughput"""
+    local = threading.local()
+
+    def una():
+        sesion = getattr(local, 'sesion', None)
+        if sesion is None:
+            sesion = local.sesion = requests.Session()
+        inicio = time.perf_counter()
+        respuesta = sesion.request(metodo, url_base + ruta, json=cuerpo, timeout=600)
+        contenido = respuesta.content
+        return (time.perf_counter() - inicio) * 1000, respuesta.status_code, len(contenido)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        resultados = list(pool.map(lambda _: una(), range(peticiones)))
+    segundos = time.perf_counter() - inicio
+
+    latencias = sorted(r[0] for r in resultados)
+    return {
+        'peticiones': peticiones,
+        'concurrencia': concurrencia,
+        'errores': sum(1 for r in resultados if r[1] >= 400),
+        'peticiones_por_segundo': round(peticiones / segundos, 2),
+        'p50_ms': _percentil(latencias, 50),
+        'p95_ms': _percentil(latencias, 95),
+        'p99_ms': _percentil(latencias, 99),
+        'bytes_medios': round(sum(r[2] for r in resultados) / len(resultados))
+    }
+
+def arrancar_api_local():
+    """Levantar app.py en un hilo y devolver (url, servidor)"""
+    from werkzeug.serving import make_server
+    from app import app
+
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_port}", servidor
+
+def medir_api(url_base=None, peticiones=200, concurrencia=8):
+    """Ejecutar todos los escenarios y devolver sus cifras"""
+    servidor = None
+    if url_base is None:
+        url_base, servidor = arrancar_api_local()
+
+    try:
+        resultados = {}
+        for nombre, metodo, ruta, cuerpo, proporcion in ESCENARIOS:
+            n = max(2, int(peticiones * proporcion))
+            # Calentar cachés de PostgreSQL y del proceso
+            cargar(url_base, metodo, ruta, cuerpo, 1, 1)
+            resultados[nombre] = cargar(url_base, metodo, ruta, cuerpo, n, min(concurrencia, n))
+        return resultados
+    finally:
+        if servidor:
+            servidor.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='API ya desplegada (por defecto, app.py en este proceso)')
+    parser.add_argument('--peticiones', type=int, default=200)
+    parser.add_argument('--concurrencia', type=int, default=8)
+    args = parser.parse_args()
+    print(json.dumps(medir_api(args.url, args.peticiones, args.concurrencia), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Tiempo de importación de la API (lo que tarda cada worker de gunicorn en arrancar).
+
+Importa app.py en procesos nuevos con `python -X importtime`, toma la
+mediana y comprueba que no entren en el arranque los módulos pesados que
+solo se usan bajo demanda (scraper, boto3, openpyxl, pyarrow...). Sale con
+código 1 si se pasa del presupuesto, para usarlo en CI.
+
+Uso: python benchmarks/bench_arranque.py --repeticiones 5 --presupuesto-ms 400
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que la API debe cargar de forma perezosa
+PEREZOSOS = ('scraper', 'boto3', 'botocore', 'openpyxl', 'pyarrow', 'bs4', 'lxml', 'PIL', 'pypdf', 'numpy')
+
+def _importar(modulo):
+    """Importar `modulo` en un proceso nuevo; devuelve (segundos, [(self_us, acumulado_us, nombre)])"""
+    inicio = time.perf_counter()
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=RAIZ, capture_output=True, text=True
+    )
+    segundos = time.perf_counter() - inicio
+    if proceso.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{proceso.stderr[-2000:]}")
+
+    importaciones = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, acumulado, nombre = linea[len('import time:'):].split('|')
+        # Tras el separador va un espacio y luego dos más por nivel de anidamiento
+        importaciones.append((int(propio), int(acumulado), nombre[1:].rstrip()))
+    return segundos, importaciones
+
+def medir_arranque(modulo='app', repeticiones=5, presupuesto_ms=400):
+    """Mediana del tiempo de importación de `modulo` y módulos más costosos"""
+    tiempos_import, tiempos_proceso = [], []
+    importaciones = []
+    for _ in range(repeticiones):
+        segundos, importaciones = _importar(modulo)
+        tiempos_proceso.append(segundos * 1000)
+        # La línea del propio módulo (sin sangría) lleva el acumulado total
+        total = next(acumulado for _, acumulado, nombre in importaciones if nombre == modulo)
+        tiempos_import.append(total / 1000)
+
+    nombres = {nombre.strip() for _, _, nombre in importaciones}
+    perezosos_cargados = sorted(
+        m for m in PEREZOSOS if m in nombres or any(n.startswith(f'{m}.') for n in nombres)
+    )
+    mediana = statistics.median(tiempos_import)
+    return {
+        'modulo': modulo,
+        'repeticiones': repeticiones,
+        'import_ms': round(mediana, 1),
+        'proceso_ms': round(statistics.median(tiempos_proceso), 1),
+        'presupuesto_ms': presupuesto_ms,
+        'dentro_presupuesto': mediana <= presupuesto_ms and not perezosos_cargados,
+        'perezosos_cargados': perezosos_cargados,
+        'mas_costosos': [
+            {'modulo': nombre.strip(), 'propio_ms': round(propio / 1000, 1)}
+            for propio, _, nombre in sorted(importaciones, reverse=True)[:10]
+        ]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modulo', default='app')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--presupuesto-ms', type=float, default=400)
+    args = parser.parse_args()
+    resultado = medir_arranque(args.modulo, args.repeticiones, args.presupuesto_ms)
+    print(json.dumps(resultado, indent=2))
+    if not resultado['dentro_presupuesto']:
+        print(f"❌ Arranque fuera de presupuesto ({resultado['import_ms']} ms, "
+              f"perezosos cargados: {resultado['perezosos_cargados']})", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
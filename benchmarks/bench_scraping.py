@@ -0,0 +1,97 @@
+"""Throughput de scraping_completo contra el servidor falso.
+
+Arranca servidor_falso.py, apunta el scraper a él (BOE, Nominatim y S3),
+quita las pausas de cortesía y recorre un subconjunto de las búsquedas.
+Escribe en la base de datos de DATABASE_URL: usa una de pruebas.
+
+Uso: python benchmarks/bench_scraping.py --provincias 2 --tipos 2 --latencia-ms 20
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from servidor_falso import ServidorFalso
+
+def medir_scraping(provincias=2, tipos=2, resultados=5, latencia_ms=20, imagenes=2, documentos=1):
+    """Ejecutar un scraping acotado y devolver sus cifras"""
+    servidor = ServidorFalso(latencia_ms=latencia_ms, resultados=resultados,
+                             imagenes=imagenes, documentos=documentos)
+    url = servidor.iniciar()
+
+    # El scraper lee su configuración al importarse
+    os.environ.update({
+        'BOE_BASE_URL': url,
+        'NOMINATIM_URL': f"{url}/search",
+        'AWS_ENDPOINT_URL': url,
+        'AWS_ACCESS_KEY': 'bench',
+        'AWS_SECRET_KEY': 'bench',
+        'SCRAPER_PAUSA_DETALLE': '0',
+        'SCRAPER_PAUSA_BUSQUEDA': '0',
+    })
+    import almacenamiento
+    import metricas
+    import scraper
+    from migraciones import migrar
+
+    # Por si otro benchmark ya los importó con la configuración real
+    importlib.reload(almacenamiento)
+    scraper = importlib.reload(scraper)
+
+    migrar()
+    scraper.PROVINCIAS = scraper.PROVINCIAS[:provincias]
+    scraper.TIPOS_BIEN = scraper.TIPOS_BIEN[:tipos]
+    scraper.TIPOS_SUBASTA = scraper.TIPOS_SUBASTA[:1]
+    metricas.reiniciar()
+
+    inicio = time.perf_counter()
+    try:
+        scraper.scraping_completo(estados=scraper.ESTADOS[:1])
+    finally:
+        segundos = time.perf_counter() - inicio
+        servidor.parar()
+
+    datos = metricas.instantanea()
+    # Una segunda pasada sobre la misma base de datos no guarda nada: cuentan
+    # todas las subastas procesadas, sean nuevas, actualizadas o sin cambios
+    resultados = {
+        clave: datos['contadores'].get(f'subastas_{clave}', 0)
+        for clave in ('insertada', 'actualizada', 'sin_cambios')
+    }
+    procesadas = sum(resultados.values())
+    return {
+        'segundos': round(segundos, 3),
+        'busquedas': datos['contadores'].get('busquedas', 0),
+        'subastas': procesadas,
+        'resultados': resultados,
+        'subastas_por_segundo': round(procesadas / segundos, 2) if segundos else None,
+        'latencia_ms': latencia_ms,
+        'servidor': servidor.contadores(),
+        'etapas': {
+            etapa: {
+                'cuenta': h['cuenta'],
+                'total_s': h['suma'],
+                'media_ms': round(h['suma'] / h['cuenta'] * 1000, 2) if h['cuenta'] else None
+            }
+            for etapa, h in datos['histogramas'].items()
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--provincias', type=int, default=2)
+    parser.add_argument('--tipos', type=int, default=2)
+    parser.add_argument('--resultados', type=int, default=5)
+    parser.add_argument('--latencia-ms', type=float, default=20)
+    args = parser.parse_args()
+    resultado = medir_scraping(args.provincias, args.tipos, args.resultados, args.latencia_ms)
+    print(json.dumps(resultado, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Micro-benchmark de la serialización en Python de las subastas.
+
+Compara el recorrido antiguo (dict por fila + conversión campo a campo +
+json estándar) con serializacion.py (orjson) sobre un payload sintético.
+serializar_subasta es lo que usa hoy la ficha /api/subasta/<id>; el
+listado /api/subastas ya no pasa por aquí (el JSON lo genera PostgreSQL) y
+se mide con bench_api.
+
+Uso: python benchmarks/bench_serializacion.py [filas]
+"""
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serializacion import a_json, serializar_subasta
+
+CAMPOS_DECIMALES = [
+    'cantidad_reclamada', 'valor_tasacion', 'valor_subasta', 'tramos_pujas',
+    'puja_minima', 'puja_maxima', 'importe_deposito', 'latitud', 'longitud'
+]
+
+def generar_filas(n):
+    """Filas con los mismos tipos que devuelve psycopg2 para subastas"""
+    rnd = random.Random(42)
+    hoy = date(2024, 1, 1)
+    filas = []
+    for i in range(n):
+        fila = {
+            'id': f'SUB-JA-2024-{i:06d}',
+            'titulo': f'Subasta {i}',
+            'descripcion': 'Vivienda unifamiliar con garaje y trastero ' * 3,
+            'tipo_bien': 'Inmuebles - Vivienda',
+            'tipo_subasta': 'Judicial',
+            'estado': 'Celebrándose',
+            'lotes': '',
+            'provincia': 'Madrid',
+            'localidad': 'Madrid',
+            'direccion': f'Calle Mayor {i}',
+            'referencia_catastral': '1234567VK4713S0001AB',
+            'marca': '', 'modelo': '', 'matricula': '',
+            'nombre_acreedor': 'Juzgado de Primera Instancia',
+            'fecha_inicio': hoy + timedelta(days=i % 365),
+            'fecha_conclusion': hoy + timedelta(days=i % 365 + 20),
+            'url_detalle': f'https://subastas.boe.es/detalleSubasta.php?idSub=SUB-JA-2024-{i:06d}',
+            'fecha_scraping': datetime(2024, 1, 1, 12, 0, 0),
+            'actualizado': datetime(2024, 1, 2, 12, 0, 0),
+        }
+        for campo in CAMPOS_DECIMALES:
+            fila[campo] = Decimal(f'{rnd.uniform(1000, 500000):.2f}')
+        fila['latitud'] = Decimal(f'{rnd.uniform(36, 43):.8f}')
+        fila['longitud'] = Decimal(f'{rnd.uniform(-9, 3):.8f}')
+        filas.append(fila)
+    return filas
+
+def serializar_antiguo(filas):
+    """Copia del recorrido que hacía app.py antes de serializacion.py"""
+    subastas = []
+    for subasta in filas:
+        subasta_dict = dict(subasta)
+        for campo in ['fecha_inicio', 'fecha_conclusion', 'fecha_scraping', 'actualizado']:
+            if subasta_dict.get(campo):
+                subasta_dict[campo] = subasta_dict[campo].isoformat()
+        for key in CAMPOS_DECIMALES:
+            if subasta_dict.get(key) is not None:
+                subasta_dict[key] = float(subasta_dict[key])
+        if subasta_dict.get('latitud') and subasta_dict.get('longitud'):
+            subasta_dict['coordenadas'] = {
+                'lat': float(subasta_dict['latitud']),
+                'lng': float(subasta_dict['longitud'])
+            }
+        subasta_dict['imagenes'] = []
+        subasta_dict['documentos'] = []
+        subastas.append(subasta_dict)
+    return json.dumps({"success": True, "data": subastas, "total": len(subastas)}).encode()
+
+def serializar_nuevo(filas):
+    """serializacion.py, fila a fila como en la ficha de /api/subasta/<id>"""
+    subastas = []
+    for fila in filas:
+        subasta = serializar_subasta(fila)
+        subasta['imagenes'] = []
+        subasta['documentos'] = []
+        subastas.append(subasta)
+    return a_json({"success": True, "data": subastas, "total": len(subastas)})
+
+def medir(funcion, filas, repeticiones=5):
+    """Mejor tiempo de varias repeticiones"""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(filas)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    filas = generar_filas(n)
+
+    resultados = {}
+    for nombre, funcion in [('antiguo', serializar_antiguo), ('orjson', serializar_nuevo)]:
+        segundos = medir(funcion, filas)
+        resultados[nombre] = {
+            'segundos': round(segundos, 4),
+            'filas_por_segundo': round(n / segundos)
+        }
+
+    resultados['filas'] = n
+    resultados['mejora'] = round(resultados['antiguo']['segundos'] / resultados['orjson']['segundos'], 2)
+    print(json.dumps(resultados, indent=2))
+
+if __name__ == '__main__':
+    main()
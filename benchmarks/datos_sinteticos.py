@@ -0,0 +1,128 @@
+"""Carga de subastas sintéticas en PostgreSQL para los benchmarks de la API.
+
+Usa COPY por bloques, así que 500k subastas tardan segundos. Con --reset
+vacía antes las tablas: apunta DATABASE_URL a una base de datos de pruebas.
+
+Uso: python benchmarks/datos_sinteticos.py 100000 --reset
+"""
+import argparse
+import io
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import COLUMNAS_SCRAPEADAS, get_db_connection, refrescar_estadisticas
+from migraciones import migrar
+from scraper import PROVINCIAS, TIPOS_BIEN, TIPOS_SUBASTA, ESTADOS
+
+def _fila_subasta(i, rnd):
+    """Una subasta sintética como lista de valores de COPY (orden de COLUMNAS_SCRAPEADAS)"""
+    id_subasta = f"SUB-SINT-{i:07d}"
+    valor = round(rnd.uniform(5000, 900000), 2)
+    inicio = date(2020, 1, 1) + timedelta(days=rnd.randrange(365 * 5))
+    con_coordenadas = rnd.random() < 0.8
+    return [
+        id_subasta,
+        f"Subasta sintética {i}",
+        f"Bien {i} en {rnd.choice(PROVINCIAS)}. Vivienda con garaje, trastero y zonas comunes.",
+        rnd.choice(TIPOS_BIEN),
+        rnd.choice(TIPOS_SUBASTA),
+        rnd.choice(ESTADOS),
+        '',
+        rnd.choice(PROVINCIAS),
+        f"Localidad {rnd.randrange(500)}",
+        f"Calle {rnd.randrange(2000)} nº {rnd.randrange(1, 200)}",
+        f"{rnd.uniform(36, 43.5):.8f}" if con_coordenadas else None,
+        f"{rnd.uniform(-9, 3.3):.8f}" if con_coordenadas else None,
+        f"{rnd.randrange(10**13):014d}AB",
+        '', '', '',
+        f"{valor * rnd.uniform(0.2, 1.5):.2f}",
+        f"{valor * rnd.uniform(1.0, 1.6):.2f}",
+        f"{valor:.2f}",
+        f"{rnd.choice([0, 100, 500, 1000, 5000]):.2f}",
+        f"{valor * 0.5:.2f}",
+        f"{valor * rnd.uniform(0, 1.1):.2f}",
+        f"{valor * 0.05:.2f}",
+        "Juzgado de Primera Instancia",
+        inicio.isoformat(),
+        (inicio + timedelta(days=20)).isoformat(),
+        f"https://subastas.boe.es/detalleSubasta.php?idSub={id_subasta}"
+    ]
+
+def _linea_copy(valores):
+    return '\t'.join('\\N' if v is None else str(v) for v in valores) + '\n'
+
+def _copiar(cur, tabla, columnas, lineas):
+    buffer = io.StringIO(''.join(lineas))
+    cur.copy_expert(f"COPY {tabla} ({', '.join(columnas)}) FROM STDIN", buffer)
+
+def sembrar(n, imagenes=2, documentos=1, reset=False, bloque=20000, semilla=42):
+    """Insertar n subastas sintéticas con sus imágenes, documentos y lotes (de uno a tres)"""
+    migrar()
+    rnd = random.Random(semilla)
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    if reset:
+        # También el registro de cambios, el archivo y las ejecuciones, para no
+        # arrastrar cursores ni versiones del catálogo de la carga anterior.
+        # Sin RESTART IDENTITY: los ids siguen creciendo y la versión de los
+        # datos nunca vuelve a coincidir con la de una instantánea vieja
+        cur.execute('''
+            TRUNCATE subastas, imagenes, documentos, lotes, estadisticas_resumen,
+                     subastas_cambios, subastas_archivo, imagenes_archivo,
+                     documentos_archivo, lotes_archivo, scraping_ejecuciones CASCADE
+        ''')
+
+    for inicio in range(0, n, bloque):
+        filas, lineas_img, lineas_doc, lineas_lote = [], [], [], []
+        for i in range(inicio, min(n, inicio + bloque)):
+            fila = _fila_subasta(i, rnd)
+            filas.append(_linea_copy(fila))
+            for j in range(imagenes):
+                nombre = f"imagen_{j + 1}.jpg"
+                url = f"https://auctionbrokers-files.s3.eu-west-3.amazonaws.com/subastas/{fila[0]}/imagenes/{nombre}"
+                lineas_img.append(_linea_copy([fila[0], nombre, url, url, rnd.randrange(200000, 3000000)]))
+            for j in range(documentos):
+                nombre = f"Edicto {j + 1}.pdf"
+                url = f"https://auctionbrokers-files.s3.eu-west-3.amazonaws.com/subastas/{fila[0]}/documentos/{nombre}"
+                lineas_doc.append(_linea_copy([fila[0], nombre, 'pdf', url, url, rnd.randrange(50000, 900000)]))
+            for numero in range(1, rnd.choice([1, 1, 2, 3]) + 1):
+                valor = round(rnd.uniform(1000, 400000), 2)
+                lineas_lote.append(_linea_copy([
+                    fila[0], numero, f"Lote {numero}: {rnd.choice(['vivienda', 'plaza de garaje', 'trastero', 'local'])}",
+                    f"{valor * rnd.uniform(1.0, 1.6):.2f}", f"{valor:.2f}", f"{valor * 0.05:.2f}"
+                ]))
+
+        _copiar(cur, 'subastas', COLUMNAS_SCRAPEADAS, filas)
+        _copiar(cur, 'imagenes', ['subasta_id', 'nombre', 'url_original', 'url_s3', 'size_bytes'], lineas_img)
+        _copiar(cur, 'documentos', ['subasta_id', 'nombre', 'tipo', 'url_original', 'url_s3', 'size_bytes'], lineas_doc)
+        _copiar(cur, 'lotes', ['subasta_id', 'numero', 'descripcion', 'valor_tasacion', 'valor_subasta',
+                               'importe_deposito'], lineas_lote)
+        conn.commit()
+        print(f"  🌱 {min(n, inicio + bloque)}/{n} subastas sintéticas")
+
+    conn.autocommit = True
+    cur.execute('ANALYZE subastas')
+    cur.execute('ANALYZE imagenes')
+    cur.execute('ANALYZE documentos')
+    cur.execute('ANALYZE lotes')
+    cur.close()
+    conn.close()
+
+    refrescar_estadisticas()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('subastas', type=int)
+    parser.add_argument('--imagenes', type=int, default=2)
+    parser.add_argument('--documentos', type=int, default=1)
+    parser.add_argument('--reset', action='store_true', help='vaciar las tablas antes de cargar')
+    args = parser.parse_args()
+    sembrar(args.subastas, args.imagenes, args.documentos, args.reset)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Suite completa de benchmarks con salida JSON para seguir regresiones.
+
+Para cada tamaño carga subastas sintéticas (vaciando las tablas), mide la
+API, y después mide el scraper contra el servidor falso, la serialización
+de la ficha de subasta y el arranque de la API. Necesita DATABASE_URL
+apuntando a una base de datos de pruebas.
+
+Uso: python benchmarks/ejecutar.py --tamanos 10000,100000,500000 --salida bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(DIRECTORIO)
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, DIRECTORIO)
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=RAIZ, text=True).strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', default='10000,100000', help='subastas sintéticas por pasada')
+    parser.add_argument('--peticiones', type=int, default=200)
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--latencia-ms', type=float, default=20, help='latencia del BOE falso')
+    parser.add_argument('--sin-api', action='store_true')
+    parser.add_argument('--sin-scraping', action='store_true')
+    parser.add_argument('--salida', help='fichero JSON (por defecto, stdout)')
+    args = parser.parse_args()
+
+    resultados = {
+        'commit': _commit(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'api': {},
+        'scraping': None,
+        'serializacion_ficha': None,
+        'arranque': None
+    }
+
+    if not args.sin_api:
+        from bench_api import medir_api
+        from datos_sinteticos import sembrar
+        for tamano in [int(t) for t in args.tamanos.split(',') if t]:
+            print(f"📊 API con {tamano} subastas", file=sys.stderr)
+            sembrar(tamano, reset=True)
+            resultados['api'][str(tamano)] = medir_api(None, args.peticiones, args.concurrencia)
+
+    if not args.sin_scraping:
+        from bench_scraping import medir_scraping
+        print("📊 Scraping contra el BOE falso", file=sys.stderr)
+        resultados['scraping'] = medir_scraping(latencia_ms=args.latencia_ms)
+
+    # Solo la ficha serializa en Python; el coste del listado está en 'api'
+    from bench_serializacion import generar_filas, medir, serializar_nuevo
+    filas = generar_filas(50000)
+    segundos = medir(serializar_nuevo, filas)
+    resultados['serializacion_ficha'] = {'filas': 50000, 'filas_por_segundo': round(50000 / segundos)}
+
+    from bench_arranque import medir_arranque
+    resultados['arranque'] = medir_arranque()
+
+    salida = json.dumps(resultados, indent=2)
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            f.write(salida)
+        print(f"✅ Resultados en {args.salida}", file=sys.stderr)
+    else:
+        print(salida)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""Servidor HTTP local que imita subastas.boe.es, Nominatim y S3.
+
+Sirve búsquedas, páginas de detalle, imágenes JPEG y PDFs sintéticos con
+una latencia configurable, responde al geocodificador y acepta los PUT de
+boto3 (AWS_ENDPOINT_URL apuntando aquí). Los ids de las subastas salen de
+los parámetros de búsqueda, así que dos pasadas generan los mismos datos.
+
+Uso independiente: python benchmarks/servidor_falso.py --puerto 8099 --latencia-ms 50
+"""
+import argparse
+import hashlib
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def generar_jpeg(ancho=1600, alto=1200):
+    """Foto sintética del tamaño de las del BOE"""
+    from PIL import Image
+    imagen = Image.effect_noise((ancho, alto), 48).convert('RGB')
+    salida = io.BytesIO()
+    imagen.save(salida, 'JPEG', quality=85)
+    return salida.getvalue()
+
+def generar_pdf(texto, paginas=1):
+    """PDF mínimo válido con una línea de texto por página"""
+    objetos = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = ' '.join(f"{3 + i * 2} 0 R" for i in range(paginas)).encode()
+    objetos.append(b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % paginas)
+    fuente = 3 + paginas * 2
+    for i in range(paginas):
+        contenido = f"BT /F1 12 Tf 72 720 Td ({texto} - pagina {i + 1}) Tj ET".encode('latin-1')
+        objetos.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (4 + i * 2, fuente)
+        )
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(contenido) + contenido + b"\nendstream")
+    objetos.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    salida = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, objeto in enumerate(objetos, 1):
+        offsets.append(len(salida))
+        salida += b"%d 0 obj\n" % i + objeto + b"\nendobj\n"
+    xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for offset in offsets:
+        salida += b"%010d 00000 n \n" % offset
+    salida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, xref)
+    return bytes(salida)
+
+def _id_busqueda(query):
+    """Prefijo estable para los ids de una combinación de filtros"""
+    return hashlib.sha1(query.encode()).hexdigest()[:8].upper()
+
+def _html_busqueda(query, resultados):
+    prefijo = _id_busqueda(query)
+    enlaces = ''.join(
+        f'<li><a href="detalleSubasta.php?idSub=SUB-{prefijo}-{i:04d}">Subasta {i}</a></li>'
+        for i in range(resultados)
+    )
+    return f"<html><body><ul>{enlaces}</ul></body></html>"
+
+def _euros(valor):
+    """Importe con el formato del BOE: 123.456,78 €"""
+    return f'{valor:,.2f} €'.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+def _html_detalle(id_subasta, imagenes, documentos):
+    n = int(hashlib.sha1(id_subasta.encode()).hexdigest()[:6], 16)
+    valor = 50000 + n % 450000
+    filas = [
+        ('Descripción', f'Vivienda {id_subasta} con garaje y trastero'),
+        ('Tipo de bien', 'Inmuebles - Vivienda'),
+        ('Tipo de subasta', 'Judicial'),
+        ('Estado', 'Celebrándose'),
+        ('Lotes', f'{n % 3 + 1} lotes' if n % 3 else 'Sin lotes'),
+        ('Provincia', 'Madrid'),
+        ('Localidad', 'Localidad de prueba'),
+        ('Dirección', f'Calle Falsa {n % 200}'),
+        ('Referencia catastral', f'{n:014d}AB'),
+        ('Cantidad reclamada', _euros(valor * 0.6)),
+        ('Valor de tasación', _euros(valor * 1.2)),
+        ('Valor subasta', _euros(valor)),
+        ('Tramos entre pujas', '1.000,00 €'),
+        ('Importe del depósito', _euros(valor * 0.05)),
+        ('Acreedor', 'Juzgado de Primera Instancia nº 1'),
+        ('Fecha de inicio', f'{1 + n % 28:02d}/{1 + n % 12:02d}/2024'),
+        ('Fecha de conclusión', f'{1 + n % 28:02d}/{1 + (n + 1) % 12:02d}/2024'),
+    ]
+    tabla = ''.join(f'<tr><th>{campo}</th><td>{valor}</td></tr>' for campo, valor in filas)
+    # Una de cada tres subastas no tiene lotes; el resto, dos o tres
+    lotes = ''.join(
+        f'<h3>Lote {i + 1}</h3><table>'
+        f'<tr><th>Descripción</th><td>Lote {i + 1}: plaza de garaje {n % 90 + i}</td></tr>'
+        f'<tr><th>Valor subasta</th><td>{_euros(valor / (i + 2))}</td></tr>'
+        f'<tr><th>Valor de tasación</th><td>{_euros(valor * 1.2 / (i + 2))}</td></tr>'
+        f'<tr><th>Importe del depósito</th><td>{_euros(valor * 0.05 / (i + 2))}</td></tr>'
+        f'</table>'
+        for i in range(n % 3 + 1 if n % 3 else 0)
+    )
+    fotos = ''.join(
+        f'<img class="foto" src="imagenes/{id_subasta}_{i + 1}.jpg">' for i in range(imagenes)
+    )
+    docs = ''.join(
+        f'<a href="documentos/{id_subasta}_{i + 1}.pdf">Edicto {i + 1}</a>' for i in range(documentos)
+    )
+    return f"<html><body><h1>Subasta {id_subasta}</h1><table>{tabla}</table>{lotes}{fotos}{docs}</body></html>"
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, cuerpo, tipo='text/html; charset=utf-8', estado=200, cabeceras=None):
+        if isinstance(cuerpo, str):
+            cuerpo = cuerpo.encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _esperar(self, tipo):
+        config = self.server.config
+        with config['lock']:
+            config['peticiones'][tipo] = config['peticiones'].get(tipo, 0) + 1
+        if config['latencia_ms']:
+            time.sleep(config['latencia_ms'] / 1000)
+
+    def do_GET(self):
+        config = self.server.config
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path.endswith('/subastas_ava.php'):
+            self._esperar('busqueda')
+            self._responder(_html_busqueda(url.query, config['resultados']))
+        elif url.path.endswith('/detalleSubasta.php'):
+            self._esperar('detalle')
+            id_subasta = query.get('idSub', ['SUB-X'])[0]
+            self._responder(_html_detalle(id_subasta, config['imagenes'], config['documentos']))
+        elif '/imagenes/' in url.path:
+            self._esperar('imagen')
+            self._responder(config['jpeg'], 'image/jpeg')
+        elif '/documentos/' in url.path:
+            self._esperar('documento')
+            self._responder(config['pdf'], 'application/pdf')
+        elif url.path.endswith('/search'):
+            self._esperar('geocodificacion')
+            self._responder(json.dumps([{'lat': '40.4168', 'lon': '-3.7038'}]), 'application/json')
+        else:
+            self._responder('No encontrado', estado=404)
+
+    def do_PUT(self):
+        # S3: PUT /<bucket>/<clave>
+        longitud = int(self.headers.get('Content-Length', 0))
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            longitud = self._leer_chunked()
+        else:
+            self.rfile.read(longitud)
+        self._esperar('s3')
+        with self.server.config['lock']:
+            self.server.config['bytes_s3'] += longitud
+        self._responder(b'', 'application/xml', cabeceras={'ETag': '"00000000000000000000000000000000"'})
+
+    def _leer_chunked(self):
+        total = 0
+        while True:
+            tamano = int(self.rfile.readline().strip().split(b';')[0], 16)
+            if tamano == 0:
+                self.rfile.readline()
+                return total
+            self.rfile.read(tamano)
+            self.rfile.readline()
+            total += tamano
+
+    def do_HEAD(self):
+        self._responder(b'')
+
+class ServidorFalso:
+    """BOE + Nominatim + S3 falsos en un hilo de fondo"""
+
+    def __init__(self, puerto=0, latencia_ms=0, resultados=5, imagenes=2, documentos=1,
+                 paginas_pdf=3):
+        self.config = {
+            'latencia_ms': latencia_ms,
+            'resultados': resultados,
+            'imagenes': imagenes,
+            'documentos': documentos,
+            'jpeg': generar_jpeg(),
+            'pdf': generar_pdf('Edicto de subasta. Cargas: hipoteca. Superficie 90 m2', paginas_pdf),
+            'peticiones': {},
+            'bytes_s3': 0,
+            'lock': threading.Lock()
+        }
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', puerto), _Manejador)
+        self.servidor.daemon_threads = True
+        self.servidor.config = self.config
+        self.hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self.servidor.server_address
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self):
+        self.hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self.hilo.start()
+        return self.url
+
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def contadores(self):
+        with self.config['lock']:
+            return {'peticiones': dict(self.config['peticiones']), 'bytes_s3': self.config['bytes_s3']}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--puerto', type=int, default=8099)
+    parser.add_argument('--latencia-ms', type=float, default=0)
+    parser.add_argument('--resultados', type=int, default=5)
+    args = parser.parse_args()
+
+    servidor = ServidorFalso(args.puerto, args.latencia_ms, args.resultados)
+    print(f"🧪 Servidor falso escuchando en {servidor.iniciar()}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.parar()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""Instantánea en memoria de las subastas vivas para las lecturas calientes.
+
+El listado y las estadísticas solo cambian cuando pasa el scraper, así que
+cada proceso de la API puede guardar el catálogo en arrays de NumPy
+(importes y ratios como float64, fechas, provincia / tipo de bien / estado
+codificados como enteros) junto con el JSON de cada subasta ya generado
+por PostgreSQL. /api/subastas y /api/stats se responden entonces con
+máscaras vectorizadas sin tocar la base de datos.
+
+Se activa con CATALOGO_MEMORIA=1. La primera instantánea se carga entera;
+después, cada CATALOGO_INTERVALO_SEGUNDOS se comprueba en segundo plano la
+versión de los datos y, si ha cambiado, solo se leen las subastas afectadas
+desde la versión de la instantánea (ver database.leer_cambios_catalogo).
+Con ellas se monta una instantánea nueva que sustituye a la anterior de
+golpe, así que durante un scraping no se regenera el JSON de todo el
+catálogo. Mientras no hay instantánea, o si los filtros no se pueden
+resolver en memoria (búsquedas de texto, lotes, archivo), se consulta
+PostgreSQL como siempre.
+"""
+import os
+import threading
+import time
+
+from database import (
+    COLUMNAS_CALCULADAS, COLUMNAS_CATALOGO, leer_cambios_catalogo, leer_catalogo, orden_listado
+)
+from metricas import cronometro
+
+CATALOGO_ACTIVO = os.getenv('CATALOGO_MEMORIA', '0') == '1'
+CATALOGO_INTERVALO = float(os.getenv('CATALOGO_INTERVALO_SEGUNDOS', 30))
+
+# Filtros que se resuelven en memoria; con cualquier otro se va a PostgreSQL
+FILTROS_ADMITIDOS = {'provincia', 'tipo_bien', 'sort', 'orden'} | {
+    f'{limite}_{columna}' for columna in COLUMNAS_CALCULADAS for limite in ('min', 'max')
+}
+DIMENSIONES = ('provincia', 'tipo_bien', 'estado')
+
+_instantanea = None
+_comprobado = 0.0
+_refrescando = False
+_lock = threading.Lock()
+
+def _codificar(valores):
+    """Codificación por diccionario: (claves, códigos int32 con -1 para NULL)"""
+    import numpy as np
+    claves = sorted({v for v in valores if v is not None})
+    indice = {clave: i for i, clave in enumerate(claves)}
+    codigos = np.fromiter((indice.get(v, -1) for v in valores), dtype=np.int32, count=len(valores))
+    return claves, codigos
+
+def _unir_codigos(claves_a, codigos_a, claves_b, codigos_b):
+    """Juntar dos columnas codificadas con diccionarios distintos en uno común"""
+    import numpy as np
+    claves = sorted(set(claves_a) | set(claves_b))
+    indice = {clave: i for i, clave in enumerate(claves)}
+
+    def recodificar(claves_x, codigos_x):
+        # El -1 del final hace que los NULL (código -1) sigan siendo -1
+        mapa = np.array([indice[clave] for clave in claves_x] + [-1], dtype=np.int32)
+        return mapa[codigos_x]
+
+    return claves, np.concatenate((recodificar(claves_a, codigos_a), recodificar(claves_b, codigos_b)))
+
+def _agregados(codigos, claves, valores):
+    """Filas de /api/stats de una dimensión: cantidad, suma y mediana de valores por clave"""
+    import numpy as np
+    n = len(claves)
+    presentes = codigos >= 0
+    codigos, valores = codigos[presentes], valores[presentes]
+    cantidad = np.bincount(codigos, minlength=n)
+
+    # Como SUM y percentile_cont de PostgreSQL, sin contar los NULL
+    con_valor = ~np.isnan(valores)
+    codigos, valores = codigos[con_valor], valores[con_valor]
+    suma = np.bincount(codigos, weights=valores, minlength=n)
+    cuantos = np.bincount(codigos, minlength=n)
+    ordenados = valores[np.lexsort((valores, codigos))]
+    mediana = np.zeros(n)
+    if len(ordenados):
+        # Los grupos quedan seguidos en `ordenados`: la mediana está en el centro de cada tramo
+        inicio = np.cumsum(cuantos) - cuantos
+        bajo = ordenados[np.clip(inicio + (cuantos - 1) // 2, 0, len(ordenados) - 1)]
+        alto = ordenados[np.clip(inicio + cuantos // 2, 0, len(ordenados) - 1)]
+        mediana = (bajo + alto) / 2
+
+    filas = [
+        (clave, int(cantidad[i]),
+         round(float(suma[i]), 2) if cuantos[i] else None,
+         round(float(mediana[i]), 2) if cuantos[i] else None)
+        for i, clave in enumerate(claves) if cantidad[i]
+    ]
+    # Mismo orden que el resumen de la base de datos
+    filas.sort(key=lambda fila: (-fila[1], fila[0]))
+    return filas
+
+class Instantanea:
+    """Catálogo de subastas vivas en arrays columnares, de solo lectura"""
+
+    def __init__(self, version, filas):
+        import numpy as np
+        columnas = list(zip(*filas)) if filas else [()] * (7 + len(COLUMNAS_CATALOGO))
+        self.ids = np.array(columnas[0], dtype=object)
+
+        self.claves = {}
+        self.codigos = {}
+        for posicion, dimension in enumerate(DIMENSIONES, 1):
+            self.claves[dimension], self.codigos[dimension] = _codificar(columnas[posicion])
+
+        # Criterios de orden y rangos como float64 (NaN para NULL); las
+        # fechas, en días desde 1970
+        self.fecha_inicio = np.array(columnas[4], dtype='datetime64[D]')
+        self.numericas = {}
+        for nombre, fechas in (('fecha_inicio', self.fecha_inicio),
+                               ('fecha_conclusion', np.array(columnas[5], dtype='datetime64[D]'))):
+            self.numericas[nombre] = np.where(np.isnat(fechas), np.nan, fechas.astype('int64'))
+        for posicion, columna in enumerate(COLUMNAS_CATALOGO, 6):
+            self.numericas[columna] = np.array(columnas[posicion], dtype=np.float64)
+
+        self.json = np.array([texto.encode() for texto in columnas[-1]], dtype=object)
+        self._preparar(version)
+
+    def _preparar(self, version):
+        self.version = version
+        self.cursor = version[0]
+        self.total = len(self.ids)
+        self.indices = {d: {clave: i for i, clave in enumerate(c)} for d, c in self.claves.items()}
+        self.estadisticas = self._calcular_estadisticas()
+
+    def con_cambios(self, version, ids, filas):
+        """Instantánea nueva sin las subastas `ids` y con `filas` (las que siguen vivas)"""
+        import numpy as np
+        quedan = np.fromiter((i not in ids for i in self.ids), dtype=bool, count=self.total)
+        nueva = Instantanea(version, filas)
+        nueva.ids = np.concatenate((self.ids[quedan], nueva.ids))
+        for dimension in DIMENSIONES:
+            nueva.claves[dimension], nueva.codigos[dimension] = _unir_codigos(
+                self.claves[dimension], self.codigos[dimension][quedan],
+                nueva.claves[dimension], nueva.codigos[dimension]
+            )
+        nueva.fecha_inicio = np.concatenate((self.fecha_inicio[quedan], nueva.fecha_inicio))
+        for nombre, valores in self.numericas.items():
+            nueva.numericas[nombre] = np.concatenate((valores[quedan], nueva.numericas[nombre]))
+        nueva.json = np.concatenate((self.json[quedan], nueva.json))
+        nueva._preparar(version)
+        return nueva
+
+    def _calcular_estadisticas(self):
+        import numpy as np
+        valores = self.numericas['valor_subasta']
+        grupos = {
+            dimension: _agregados(self.codigos[dimension], self.claves[dimension], valores)
+            for dimension in DIMENSIONES
+        }
+        con_fecha = ~np.isnat(self.fecha_inicio)
+        meses, codigos_mes = np.unique(self.fecha_inicio[con_fecha].astype('datetime64[M]'), return_inverse=True)
+        codigos = np.full(self.total, -1, dtype=np.int64)
+        codigos[con_fecha] = codigos_mes
+        grupos['mes'] = _agregados(codigos, [str(mes) for mes in meses], valores)
+
+        def formatear(dimension, filas):
+            return [
+                {dimension: clave, 'cantidad': cantidad, 'suma_valor': suma, 'mediana_valor': mediana}
+                for clave, cantidad, suma, mediana in filas
+            ]
+
+        return {
+            'total': self.total,
+            'por_provincia': formatear('provincia', grupos['provincia'][:10]),
+            'por_tipo': formatear('tipo_bien', grupos['tipo_bien']),
+            'por_estado': formatear('estado', grupos['estado']),
+            'por_mes': sorted(formatear('mes', grupos['mes']), key=lambda fila: fila['mes'])
+        }
+
+    def listado_json(self, filtros):
+        """Respuesta completa de /api/subastas para unos filtros ya admitidos"""
+        import numpy as np
+        mascara = np.ones(self.total, dtype=bool)
+        for dimension in ('provincia', 'tipo_bien'):
+            if filtros.get(dimension):
+                mascara &= self.codigos[dimension] == self.indices[dimension].get(filtros[dimension], -2)
+        for columna in COLUMNAS_CALCULADAS:
+            valores = self.numericas[columna]
+            if filtros.get(f'min_{columna}') is not None:
+                mascara &= valores >= filtros[f'min_{columna}']
+            if filtros.get(f'max_{columna}') is not None:
+                mascara &= valores <= filtros[f'max_{columna}']
+
+        # ORDER BY ... NULLS LAST: NaN queda al final en los dos sentidos
+        columna, direccion = orden_listado(filtros)
+        posiciones = np.flatnonzero(mascara)
+        claves = self.numericas[columna][posiciones]
+        posiciones = posiciones[np.argsort(claves if direccion == 'ASC' else -claves, kind='stable')]
+
+        return b''.join((
+            b'{"success": true, "data": [',
+            b', '.join(self.json[posiciones].tolist()),
+            b'], "total": %d, "cursor": %d}' % (len(posiciones), self.cursor)
+        ))
+
+def _refrescar():
+    """Cargar una instantánea nueva si la versión de los datos ha cambiado"""
+    global _instantanea, _refrescando
+    try:
+        actual = _instantanea
+        if actual is None:
+            with cronometro('catalogo_carga'):
+                _instantanea = Instantanea(*leer_catalogo())
+        else:
+            version, ids, filas, total = leer_cambios_catalogo(actual.version)
+            if version != actual.version:
+                with cronometro('catalogo_cambios'):
+                    nueva = actual.con_cambios(version, ids, filas)
+                if nueva.total != total:
+                    # Filas borradas sin pasar por subastas_cambios (TRUNCATE, a mano...)
+                    with cronometro('catalogo_carga'):
+                        nueva = Instantanea(*leer_catalogo())
+                _instantanea = nueva
+    except Exception as e:
+        print(f"⚠️ No se pudo cargar el catálogo en memoria: {e}")
+    finally:
+        with _lock:
+            _refrescando = False
+
+def _vigente():
+    """Instantánea actual (o None), lanzando la comprobación de versión si toca"""
+    global _comprobado, _refrescando
+    if not CATALOGO_ACTIVO:
+        return None
+    ahora = time.monotonic()
+    with _lock:
+        if not _refrescando and ahora - _comprobado >= CATALOGO_INTERVALO:
+            _comprobado = ahora
+            _refrescando = True
+            threading.Thread(target=_refrescar, name='catalogo', daemon=True).start()
+    return _instantanea
+
+def listado_json(filtros):
+    """JSON de /api/subastas desde memoria, o None si hay que consultar PostgreSQL"""
+    if filtros and not FILTROS_ADMITIDOS.issuperset(filtros):
+        return None
+    instantanea = _vigente()
+    if instantanea is None:
+        return None
+    return instantanea.listado_json(filtros or {})
+
+def estadisticas():
+    """Estadísticas de /api/stats desde memoria, o None si aún no hay instantánea"""
+    instantanea = _vigente()
+    return instantanea.estadisticas if instantanea else None
@@ -1,125 +1,336 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import Json, RealDictCursor
 import os
+import queue
+import threading
+import time
+import perfilado
 
 DATABASE_URL = os.getenv('DATABASE_URL')
+# Réplica de solo lectura opcional para los listados, detalle y estadísticas
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+# Tras una escritura, el proceso lee del primario durante este margen para
+# no ver datos que la réplica aún no ha recibido
+REPLICA_MARGEN_ESCRITURA = float(os.getenv('REPLICA_MARGEN_SEGUNDOS', 5))
+# Si la réplica falla, cuánto tiempo ir directamente al primario
+REPLICA_REINTENTO = float(os.getenv('REPLICA_REINTENTO_SEGUNDOS', 30))
 
-def get_db_connection():
-    """Crear conexión a PostgreSQL"""
-    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+_ultima_escritura = 0.0
+_replica_caida_hasta = 0.0
 
-def init_database():
-    """Inicializar tablas en la base de datos"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    # Tabla principal de subastas
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS subastas (
-            id VARCHAR(50) PRIMARY KEY,
-            titulo TEXT,
-            descripcion TEXT,
-            tipo_bien VARCHAR(100),
-            tipo_subasta VARCHAR(100),
-            estado VARCHAR(100),
-            lotes TEXT,
-            provincia VARCHAR(100),
-            localidad VARCHAR(200),
-            direccion TEXT,
-            latitud DECIMAL(10, 8),
-            longitud DECIMAL(11, 8),
-            referencia_catastral VARCHAR(100),
-            marca VARCHAR(100),
-            modelo VARCHAR(100),
-            matricula VARCHAR(50),
-            cantidad_reclamada DECIMAL(15, 2),
-            valor_tasacion DECIMAL(15, 2),
-            valor_subasta DECIMAL(15, 2),
-            tramos_pujas DECIMAL(15, 2),
-            puja_minima DECIMAL(15, 2),
-            puja_maxima DECIMAL(15, 2),
-            importe_deposito DECIMAL(15, 2),
-            nombre_acreedor TEXT,
-            fecha_inicio DATE,
-            fecha_conclusion DATE,
-            url_detalle TEXT,
-            fecha_scraping TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            actualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Tabla de imágenes
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS imagenes (
-            id SERIAL PRIMARY KEY,
-            subasta_id VARCHAR(50) REFERENCES subastas(id) ON DELETE CASCADE,
-            nombre VARCHAR(255),
-            url_original TEXT,
-            url_s3 TEXT,
-            size_bytes INTEGER,
-            fecha_descarga TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+class CursorCronometrado(RealDictCursor):
+    """Cursor que cronometra cada consulta para perfilado.py"""
+
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            perfilado.registrar_consulta(
+                query, time.perf_counter() - inicio,
+                explicar=lambda: self._explicar(query, vars)
+            )
+
+    def _explicar(self, query, vars):
+        """Plan de ejecución de una consulta de lectura"""
+        if not query.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return None
+        sql = self.mogrify(query, vars).decode()
+        cur = self.connection.cursor(cursor_factory=psycopg2.extensions.cursor)
+        try:
+            cur.execute('EXPLAIN ' + sql)
+            return '\n'.join(fila[0] for fila in cur.fetchall())
+        finally:
+            cur.close()
+
+# Conexiones por proceso. Debe cubrir los hilos (gthread) o greenlets
+# (gevent) que atienden peticiones a la vez; ver gunicorn.conf.py
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', os.getenv('GUNICORN_THREADS', 8)))
+DB_POOL_ESPERA = float(os.getenv('DB_POOL_ESPERA_SEGUNDOS', 30))
+DB_POOL_ACTIVO = os.getenv('DB_POOL', '1') != '0'
+
+class PoolAgotado(psycopg2.OperationalError):
+    """No quedan conexiones libres en el pool: la base de datos está bien, el proceso va saturado"""
+
+class ConexionPool(psycopg2.extensions.connection):
+    """Conexión que al cerrarse vuelve a su pool en lugar de desconectar"""
+    pool = None
+    prestada = False
+
+    def close(self):
+        if not self.prestada:
+            return super().close()
+        self.prestada = False
+        try:
+            if self.pool.devolver(self):
+                return None
+            return super().close()
+        finally:
+            self.pool.plazas.release()
+
+    def __del__(self):
+        # Conexión abandonada sin close() (p. ej. por una excepción): liberar su plaza
+        if self.prestada:
+            self.prestada = False
+            self.pool.plazas.release()
+
+class PoolConexiones:
+    """Pool de conexiones con un máximo de DB_POOL_MAX en uso a la vez"""
+
+    def __init__(self, dsn, maximo):
+        self.dsn = dsn
+        self.plazas = threading.BoundedSemaphore(maximo)
+        self._libres = []
+        self._lock = threading.Lock()
+
+    def obtener(self, cursor_factory):
+        if not self.plazas.acquire(timeout=DB_POOL_ESPERA):
+            raise PoolAgotado("No hay conexiones libres en el pool")
+        try:
+            conn = None
+            with self._lock:
+                while self._libres and conn is None:
+                    conn = self._libres.pop()
+                    if conn.closed:
+                        conn = None
+            if conn is None:
+                conn = psycopg2.connect(self.dsn, connection_factory=ConexionPool)
+                conn.pool = self
+        except Exception:
+            self.plazas.release()
+            raise
+        conn.cursor_factory = cursor_factory
+        conn.prestada = True
+        return conn
+
+    def devolver(self, conn):
+        """Guardar una conexión para reutilizarla; False si hay que cerrarla"""
+        if conn.closed:
+            return False
+        try:
+            # Deshacer lo que el llamador no confirmó y dejarla como nueva
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if conn.autocommit:
+                conn.autocommit = False
+        except psycopg2.Error:
+            return False
+        with self._lock:
+            self._libres.append(conn)
+        return True
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _pool(dsn):
+    with _pools_lock:
+        if dsn not in _pools:
+            _pools[dsn] = PoolConexiones(dsn, DB_POOL_MAX)
+        return _pools[dsn]
+
+def _conectar(dsn):
+    cursor_factory = CursorCronometrado if perfilado.PERF_ACTIVO else RealDictCursor
+    if not DB_POOL_ACTIVO:
+        return psycopg2.connect(dsn, cursor_factory=cursor_factory)
+    return _pool(dsn).obtener(cursor_factory)
+
+def registrar_escritura():
+    """Anotar que este proceso acaba de escribir (lectura de sus escrituras)"""
+    global _ultima_escritura
+    _ultima_escritura = time.monotonic()
+
+def get_db_connection(solo_lectura=False):
+    """Obtener conexión a PostgreSQL (del pool del proceso, si está activo).
+
+    Con solo_lectura=True usa la réplica si hay DATABASE_REPLICA_URL, salvo
+    que el proceso haya escrito hace poco o la réplica esté fallando; en
+    ese caso, y si no se puede conectar a ella, usa el primario.
+    """
+    global _replica_caida_hasta
+    ahora = time.monotonic()
+    if (solo_lectura and DATABASE_REPLICA_URL
+            and ahora - _ultima_escritura > REPLICA_MARGEN_ESCRITURA
+            and ahora > _replica_caida_hasta):
+        try:
+            return _conectar(DATABASE_REPLICA_URL)
+        except PoolAgotado:
+            # No es que la réplica falle: mandar las lecturas al primario lo empeoraría
+            raise
+        except psycopg2.OperationalError as e:
+            _replica_caida_hasta = ahora + REPLICA_REINTENTO
+            print(f"⚠️ Réplica no disponible, leyendo del primario: {e}")
+    return _conectar(DATABASE_URL)
+
+# Estados a partir de los cuales una subasta puede archivarse
+ESTADOS_CONCLUIDOS = ('Concluida en el portal de subastas', 'Finalizada por autoridad gestora')
+ESTADOS_ABIERTOS = ('Próxima apertura', 'Celebrándose')
+
+# Columnas generadas por PostgreSQL, en porcentaje (ver migraciones.py):
+# ratio1 = cantidad reclamada / valor subasta, ratio2 = puja máxima / valor
+# subasta, descuento_tasacion = cuánto está el valor de subasta por debajo
+# de la tasación. Son NUMERIC sin precisión: con un divisor casi nulo el
+# porcentaje puede ser enorme y no debe hacer fallar el INSERT
+COLUMNAS_CALCULADAS = {
+    'ratio1': "CASE WHEN valor_subasta > 0 THEN round(cantidad_reclamada / valor_subasta * 100, 2) END",
+    'ratio2': "CASE WHEN valor_subasta > 0 THEN round(puja_maxima / valor_subasta * 100, 2) END",
+    'descuento_tasacion': "CASE WHEN valor_tasacion > 0 THEN round((1 - valor_subasta / valor_tasacion) * 100, 2) END",
+}
+# Criterios de orden admitidos en el listado
+ORDENES_LISTADO = ('fecha_inicio', 'fecha_conclusion', 'valor_subasta') + tuple(COLUMNAS_CALCULADAS)
+
+# Columnas que se copian al archivar (mismo orden en las tablas de archivo)
+COLUMNAS_SUBASTA = [
+    'id', 'titulo', 'descripcion', 'tipo_bien', 'tipo_subasta', 'estado', 'lotes',
+    'provincia', 'localidad', 'direccion', 'latitud', 'longitud', 'referencia_catastral',
+    'marca', 'modelo', 'matricula', 'cantidad_reclamada', 'valor_tasacion', 'valor_subasta',
+    'tramos_pujas', 'puja_minima', 'puja_maxima', 'importe_deposito', 'nombre_acreedor',
+    'fecha_inicio', 'fecha_conclusion', 'url_detalle', 'fecha_scraping', 'actualizado'
+]
+COLUMNAS_IMAGEN = [
+    'id', 'subasta_id', 'nombre', 'url_original', 'url_s3', 'size_bytes', 'fecha_descarga',
+    'url_thumb', 'url_medium'
+]
+COLUMNAS_DOCUMENTO = [
+    'id', 'subasta_id', 'nombre', 'tipo', 'url_original', 'url_s3', 'size_bytes', 'fecha_descarga',
+    'texto'
+]
+COLUMNAS_LOTE = [
+    'id', 'subasta_id', 'numero', 'descripcion', 'referencia_catastral', 'localidad', 'direccion',
+    'valor_tasacion', 'valor_subasta', 'tramos_pujas', 'puja_minima', 'importe_deposito'
+]
+# Columnas de las exportaciones
+COLUMNAS_EXPORTACION = COLUMNAS_SUBASTA + list(COLUMNAS_CALCULADAS)
+# Columnas DECIMAL que las exportaciones Parquet y NDJSON entregan como float
+COLUMNAS_DECIMALES = {
+    'latitud', 'longitud', 'cantidad_reclamada', 'valor_tasacion', 'valor_subasta',
+    'tramos_pujas', 'puja_minima', 'puja_maxima', 'importe_deposito'
+} | set(COLUMNAS_CALCULADAS)
+# Lo que se devuelve de un documento en la API: el texto solo sirve para buscar
+COLUMNAS_DOCUMENTO_API = ', '.join(c for c in COLUMNAS_DOCUMENTO if c != 'texto')
+
+# Columnas que escribe el scraper en cada upsert
+COLUMNAS_SCRAPEADAS = [c for c in COLUMNAS_SUBASTA if c not in ('fecha_scraping', 'actualizado')]
+# Si la geocodificación falla en una re-lectura, se conservan las coordenadas que había
+_COLUMNAS_CONSERVADAS = {'latitud', 'longitud'}
+# Columnas de agrupación de las estadísticas: si cambian, hay que refrescar también el grupo viejo
+_COLUMNAS_AGRUPACION = ('provincia', 'tipo_bien', 'fecha_inicio')
+
+def _valor_upsert(columna):
+    if columna in _COLUMNAS_CONSERVADAS:
+        return f"COALESCE(EXCLUDED.{columna}, subastas.{columna})"
+    return f"EXCLUDED.{columna}"
+
+def _sql_upsert_subasta():
+    columnas = [c for c in COLUMNAS_SCRAPEADAS if c != 'id']
+    return f'''
+        WITH anterior AS (
+            SELECT {', '.join(_COLUMNAS_AGRUPACION)} FROM subastas WHERE id = %(id)s
+        ),
+        fila AS (
+            INSERT INTO subastas ({', '.join(COLUMNAS_SCRAPEADAS)})
+            VALUES ({', '.join(f'%({c})s' for c in COLUMNAS_SCRAPEADAS)})
+            ON CONFLICT (id) DO UPDATE SET
+                {', '.join(f'{c} = {_valor_upsert(c)}' for c in columnas)},
+                actualizado = CURRENT_TIMESTAMP
+            WHERE ({', '.join(f'subastas.{c}' for c in columnas)})
+                  IS DISTINCT FROM ({', '.join(_valor_upsert(c) for c in columnas)})
+            RETURNING id, estado, (xmax = 0) AS insertada
+        ),
+        cambio AS (
+            INSERT INTO subastas_cambios (subasta_id, tipo, estado)
+            SELECT id, CASE WHEN insertada THEN 'nueva' ELSE 'actualizada' END, estado FROM fila
         )
-    ''')
-    
-    # Tabla de documentos
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS documentos (
-            id SERIAL PRIMARY KEY,
-            subasta_id VARCHAR(50) REFERENCES subastas(id) ON DELETE CASCADE,
-            nombre VARCHAR(255),
-            tipo VARCHAR(50),
-            url_original TEXT,
-            url_s3 TEXT,
-            size_bytes INTEGER,
-            fecha_descarga TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        SELECT fila.insertada, {', '.join(f'anterior.{c}' for c in _COLUMNAS_AGRUPACION)}
+        FROM fila LEFT JOIN anterior ON TRUE
+    '''
+
+SQL_UPSERT_SUBASTA = _sql_upsert_subasta()
+
+def _sql_guardar_lotes():
+    campos = [c for c in COLUMNAS_LOTE if c not in ('id', 'subasta_id', 'numero')]
+    return f'''
+        WITH nuevos AS (
+            SELECT numero, {', '.join(campos)}
+            FROM jsonb_populate_recordset(NULL::lotes, %(lotes)s::jsonb)
+        ),
+        borrados AS (
+            DELETE FROM lotes
+            WHERE subasta_id = %(id)s AND numero NOT IN (SELECT numero FROM nuevos)
+            RETURNING 1
+        ),
+        escritos AS (
+            INSERT INTO lotes (subasta_id, numero, {', '.join(campos)})
+            SELECT %(id)s, numero, {', '.join(campos)} FROM nuevos
+            ON CONFLICT (subasta_id, numero) DO UPDATE SET
+                {', '.join(f'{c} = EXCLUDED.{c}' for c in campos)}
+            WHERE ({', '.join(f'lotes.{c}' for c in campos)})
+                  IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in campos)})
+            RETURNING 1
         )
-    ''')
-    
-    # Índices para mejorar búsquedas
-    cur.execute('CREATE INDEX IF NOT EXISTS idx_provincia ON subastas(provincia)')
-    cur.execute('CREATE INDEX IF NOT EXISTS idx_tipo_bien ON subastas(tipo_bien)')
-    cur.execute('CREATE INDEX IF NOT EXISTS idx_estado ON subastas(estado)')
-    cur.execute('CREATE INDEX IF NOT EXISTS idx_fecha_inicio ON subastas(fecha_inicio)')
-    
-    conn.commit()
-    cur.close()
-    conn.close()
-    print("✅ Base de datos inicializada correctamente")
+        SELECT (SELECT COUNT(*) FROM borrados) + (SELECT COUNT(*) FROM escritos) AS cambios
+    '''
+
+# Sustituye los lotes de una subasta, tocando solo los que han cambiado
+SQL_GUARDAR_LOTES = _sql_guardar_lotes()
 
 def insertar_subasta(subasta_data):
-    """Insertar o actualizar una subasta"""
+    """Insertar una subasta o actualizar la existente si algo ha cambiado.
+
+    Devuelve (resultado, anterior). resultado es 'insertada', 'actualizada',
+    'sin_cambios', 'archivada' (ya está en el archivo y no se toca) o None
+    si hubo un error. anterior trae provincia, tipo de bien y fecha de
+    inicio previos cuando alguno ha cambiado, para refrescar también esos
+    grupos de estadísticas.
+    
+    Si subasta_data trae 'lotes_detalle' (lista de dicts con las columnas
+    de lotes), los lotes se guardan en la misma transacción que la subasta.
+    """
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
-        cur.execute('''
-            INSERT INTO subastas (
-                id, titulo, descripcion, tipo_bien, tipo_subasta, estado, lotes,
-                provincia, localidad, direccion, latitud, longitud, referencia_catastral,
-                marca, modelo, matricula, cantidad_reclamada, valor_tasacion, valor_subasta,
-                tramos_pujas, puja_minima, puja_maxima, importe_deposito, nombre_acreedor,
-                fecha_inicio, fecha_conclusion, url_detalle
-            ) VALUES (
-                %(id)s, %(titulo)s, %(descripcion)s, %(tipo_bien)s, %(tipo_subasta)s, 
-                %(estado)s, %(lotes)s, %(provincia)s, %(localidad)s, %(direccion)s,
-                %(latitud)s, %(longitud)s, %(referencia_catastral)s, %(marca)s, %(modelo)s,
-                %(matricula)s, %(cantidad_reclamada)s, %(valor_tasacion)s, %(valor_subasta)s,
-                %(tramos_pujas)s, %(puja_minima)s, %(puja_maxima)s, %(importe_deposito)s,
-                %(nombre_acreedor)s, %(fecha_inicio)s, %(fecha_conclusion)s, %(url_detalle)s
-            )
-            ON CONFLICT (id) DO UPDATE SET
-                titulo = EXCLUDED.titulo,
-                descripcion = EXCLUDED.descripcion,
-                estado = EXCLUDED.estado,
-                actualizado = CURRENT_TIMESTAMP
-        ''', subasta_data)
+        # Las subastas ya archivadas no vuelven a la tabla caliente
+        cur.execute('SELECT 1 FROM subastas_archivo WHERE id = %s', (subasta_data['id'],))
+        if cur.fetchone():
+            return 'archivada', None
+        
+        # Solo se escribe (y se registra en subastas_cambios) si alguna
+        # columna es distinta: re-scrapear sin cambios no toca la fila
+        cur.execute(SQL_UPSERT_SUBASTA, subasta_data)
+        fila = cur.fetchone()
         
+        lotes_cambiados = False
+        if subasta_data.get('lotes_detalle') is not None:
+            cur.execute(SQL_GUARDAR_LOTES, {'id': subasta_data['id'], 'lotes': Json(subasta_data['lotes_detalle'])})
+            lotes_cambiados = cur.fetchone()['cambios'] > 0
+            if fila is None and lotes_cambiados:
+                # Solo han cambiado los lotes: también es una actualización de la subasta
+                cur.execute('''
+                    WITH fila AS (
+                        UPDATE subastas SET actualizado = CURRENT_TIMESTAMP WHERE id = %s
+                        RETURNING id, estado
+                    )
+                    INSERT INTO subastas_cambios (subasta_id, tipo, estado)
+                    SELECT id, 'actualizada', estado FROM fila
+                ''', (subasta_data['id'],))
         conn.commit()
-        return True
+        
+        if fila is None and not lotes_cambiados:
+            return 'sin_cambios', None
+        registrar_escritura()
+        if fila is None:
+            return 'actualizada', None
+        if fila['insertada']:
+            return 'insertada', None
+        
+        anterior = {c: fila[c] for c in _COLUMNAS_AGRUPACION}
+        if all(anterior[c] == subasta_data.get(c) for c in _COLUMNAS_AGRUPACION):
+            anterior = None
+        return 'actualizada', anterior
     except Exception as e:
         conn.rollback()
         print(f"❌ Error insertando subasta {subasta_data.get('id')}: {e}")
-        return False
+        return None, None
     finally:
         cur.close()
         conn.close()
@@ -131,11 +342,14 @@ def insertar_imagen(subasta_id, imagen_data):
     
     try:
         cur.execute('''
-            INSERT INTO imagenes (subasta_id, nombre, url_original, url_s3, size_bytes)
-            VALUES (%s, %s, %s, %s, %s)
+            INSERT INTO imagenes (subasta_id, nombre, url_original, url_s3, size_bytes,
+                                  url_thumb, url_medium)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
         ''', (subasta_id, imagen_data['nombre'], imagen_data['url_original'], 
-              imagen_data['url_s3'], imagen_data['size_bytes']))
+              imagen_data['url_s3'], imagen_data['size_bytes'],
+              imagen_data.get('url_thumb'), imagen_data.get('url_medium')))
         conn.commit()
+        registrar_escritura()
     except Exception as e:
         print(f"❌ Error insertando imagen: {e}")
         conn.rollback()
@@ -150,11 +364,12 @@ def insertar_documento(subasta_id, doc_data):
     
     try:
         cur.execute('''
-            INSERT INTO documentos (subasta_id, nombre, tipo, url_original, url_s3, size_bytes)
-            VALUES (%s, %s, %s, %s, %s, %s)
+            INSERT INTO documentos (subasta_id, nombre, tipo, url_original, url_s3, size_bytes, texto)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
         ''', (subasta_id, doc_data['nombre'], doc_data['tipo'], doc_data['url_original'],
-              doc_data['url_s3'], doc_data['size_bytes']))
+              doc_data['url_s3'], doc_data['size_bytes'], doc_data.get('texto')))
         conn.commit()
+        registrar_escritura()
     except Exception as e:
         print(f"❌ Error insertando documento: {e}")
         conn.rollback()
@@ -162,12 +377,9 @@ def insertar_documento(subasta_id, doc_data):
         cur.close()
         conn.close()
 
-def obtener_subastas(filtros=None):
-    """Obtener subastas con filtros opcionales"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    query = "SELECT * FROM subastas WHERE 1=1"
+def _construir_filtros(filtros, historico=False):
+    """Condiciones SQL y parámetros comunes a los listados de subastas"""
+    query = ""
     params = []
     
     if filtros:
@@ -181,8 +393,60 @@ def obtener_subastas(filtros=None):
             query += " AND (titulo ILIKE %s OR descripcion ILIKE %s)"
             search_term = f"%{filtros['search']}%"
             params.extend([search_term, search_term])
+        if filtros.get('texto_documentos'):
+            tabla_documentos = 'documentos_historico' if historico else 'documentos'
+            query += f'''
+                AND EXISTS (
+                    SELECT 1 FROM {tabla_documentos} d
+                    WHERE d.subasta_id = s.id
+                      AND d.texto_tsv @@ websearch_to_tsquery('spanish', %s)
+                )'''
+            params.append(filtros['texto_documentos'])
+        # Condiciones por lote: las cumple un mismo lote de la subasta
+        condiciones_lote = []
+        if filtros.get('texto_lotes'):
+            condiciones_lote.append("l.descripcion_tsv @@ websearch_to_tsquery('spanish', %s)")
+            params.append(filtros['texto_lotes'])
+        if filtros.get('min_valor_lote') is not None:
+            condiciones_lote.append("l.valor_subasta >= %s")
+            params.append(filtros['min_valor_lote'])
+        if filtros.get('max_valor_lote') is not None:
+            condiciones_lote.append("l.valor_subasta <= %s")
+            params.append(filtros['max_valor_lote'])
+        if condiciones_lote:
+            tabla_lotes = 'lotes_historico' if historico else 'lotes'
+            query += f'''
+                AND EXISTS (
+                    SELECT 1 FROM {tabla_lotes} l
+                    WHERE l.subasta_id = s.id
+                      AND {' AND '.join(condiciones_lote)}
+                )'''
+        for columna in COLUMNAS_CALCULADAS:
+            if filtros.get(f'min_{columna}') is not None:
+                query += f" AND {columna} >= %s"
+                params.append(filtros[f'min_{columna}'])
+            if filtros.get(f'max_{columna}') is not None:
+                query += f" AND {columna} <= %s"
+                params.append(filtros[f'max_{columna}'])
     
-    query += " ORDER BY fecha_inicio DESC"
+    return query, params
+
+def orden_listado(filtros):
+    """(columna, dirección) del orden pedido en filtros['sort'] / filtros['orden']"""
+    columna = (filtros or {}).get('sort') or 'fecha_inicio'
+    if columna not in ORDENES_LISTADO:
+        columna = 'fecha_inicio'
+    direccion = 'ASC' if (filtros or {}).get('orden') == 'asc' else 'DESC'
+    return columna, direccion
+
+def obtener_subastas(filtros=None):
+    """Obtener subastas con filtros opcionales"""
+    conn = get_db_connection(solo_lectura=True)
+    cur = conn.cursor()
+    
+    condiciones, params = _construir_filtros(filtros)
+    columna, direccion = orden_listado(filtros)
+    query = f"SELECT * FROM subastas s WHERE 1=1{condiciones} ORDER BY {columna} {direccion} NULLS LAST"
     
     cur.execute(query, params)
     resultados = cur.fetchall()
@@ -192,9 +456,336 @@ def obtener_subastas(filtros=None):
     
     return resultados
 
+def _sql_subasta_json(historico=False):
+    """Documento JSON de una subasta tal y como lo devuelve /api/subastas:
+    todas las columnas, más coordenadas, imágenes y documentos anidados"""
+    sufijo = '_historico' if historico else ''
+    return f'''
+    to_jsonb(s)
+    || CASE WHEN s.latitud <> 0 AND s.longitud <> 0
+            THEN jsonb_build_object('coordenadas', jsonb_build_object('lat', s.latitud, 'lng', s.longitud))
+            ELSE '{{}}'::jsonb END
+    || jsonb_build_object(
+        'imagenes', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', i.id,
+                'nombre', i.nombre
+            ) ORDER BY i.id)
+            FROM imagenes{sufijo} i WHERE i.subasta_id = s.id
+        ), '[]'::jsonb),
+        'documentos', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', d.id,
+                'nombre', d.nombre,
+                'size', CASE WHEN d.size_bytes > 0
+                             THEN round(d.size_bytes / 1024.0)::text || ' KB'
+                             ELSE 'N/A' END
+            ) ORDER BY d.id)
+            FROM documentos{sufijo} d WHERE d.subasta_id = s.id
+        ), '[]'::jsonb)
+    )
+    '''
+
+def obtener_subastas_json(filtros=None):
+    """Obtener el listado de subastas como documento JSON generado en PostgreSQL.
+
+    Devuelve el texto de la respuesta completa de /api/subastas, listo para
+    enviarlo sin pasar las filas por objetos Python. Solo mira las subastas
+    vivas salvo que filtros['incluir_archivo'] esté activo.
+    """
+    conn = get_db_connection(solo_lectura=True)
+    cur = conn.cursor()
+    
+    historico = bool(filtros and filtros.get('incluir_archivo'))
+    condiciones, params = _construir_filtros(filtros, historico)
+    columna, direccion = orden_listado(filtros)
+    cur.execute(f'''
+        SELECT json_build_object(
+            'success', true,
+            'data', COALESCE(json_agg(f.subasta ORDER BY f.orden {direccion} NULLS LAST), '[]'::json),
+            'total', COUNT(*),
+            'cursor', (SELECT COALESCE(max(id), 0) FROM subastas_cambios)
+        )::text AS payload
+        FROM (
+            SELECT s.{columna} AS orden, {_sql_subasta_json(historico)} AS subasta
+            FROM {'subastas_historico' if historico else 'subastas'} s
+            WHERE 1=1{condiciones}
+        ) f
+    ''', params)
+    payload = cur.fetchone()['payload']
+    
+    cur.close()
+    conn.close()
+    
+    return payload
+
+# Columnas numéricas de cada fila de leer_catalogo, tras id, provincia, tipo
+# de bien, estado y fechas
+COLUMNAS_CATALOGO = ['valor_subasta'] + list(COLUMNAS_CALCULADAS)
+
+def _sql_catalogo():
+    return f'''
+        SELECT s.id, s.provincia, s.tipo_bien, COALESCE(s.estado, ''), s.fecha_inicio, s.fecha_conclusion,
+               {', '.join(f's.{c}::float8' for c in COLUMNAS_CATALOGO)},
+               ({_sql_subasta_json()})::text
+        FROM subastas s
+    '''
+
+def leer_catalogo():
+    """Subastas vivas para la instantánea en memoria (ver catalogo.py).
+
+    Devuelve (versión, filas) leídas en la misma transacción. Cada fila es
+    una tupla (id, provincia, tipo_bien, estado, fecha_inicio,
+    fecha_conclusion, COLUMNAS_CATALOGO como float..., JSON de la subasta en
+    el listado).
+    """
+    conn = get_db_connection(solo_lectura=True)
+    cur = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+    
+    try:
+        # Versión y filas de la misma foto de la base de datos
+        cur.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        version = _version_datos(cur)
+        cur.execute(_sql_catalogo())
+        filas = cur.fetchall()
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    
+    return version, filas
+
+def leer_cambios_catalogo(version):
+    """Lo que ha cambiado en el catálogo desde `version` (ver leer_catalogo).
+
+    Devuelve (versión nueva, ids afectados, filas, total). Afectadas son
+    las subastas con un cambio en subastas_cambios o con imágenes o
+    documentos nuevos; filas trae las que siguen vivas, en el formato de
+    leer_catalogo, y las que no aparecen se han archivado. Con un solo
+    escritor (el lock del scraping) los ids nuevos siempre son mayores que
+    los de `version`. total es el número de subastas vivas, para comprobar
+    el resultado: si se vacían las tablas a mano no queda rastro de ello.
+    """
+    conn = get_db_connection(solo_lectura=True)
+    cur = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+    
+    try:
+        cur.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        nueva = _version_datos(cur)
+        ids, filas, total = set(), [], None
+        if nueva != tuple(version):
+            cur.execute('''
+                SELECT subasta_id FROM subastas_cambios WHERE id > %s
+                UNION SELECT subasta_id FROM imagenes WHERE id > %s
+                UNION SELECT subasta_id FROM documentos WHERE id > %s
+            ''', tuple(version))
+            ids = {fila[0] for fila in cur.fetchall()}
+            if ids:
+                cur.execute(f'{_sql_catalogo()} WHERE s.id = ANY(%s)', (list(ids),))
+                filas = cur.fetchall()
+            cur.execute('SELECT COUNT(*) FROM subastas')
+            total = cur.fetchone()[0]
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    
+    return nueva, ids, filas, total
+
+def _version_datos(cur):
+    """Versión de lo que devuelve el listado: últimos ids de cambios, imágenes y documentos.
+
+    Los lotes y los archivados siempre dejan un cambio en subastas_cambios.
+    """
+    cur.execute('''
+        SELECT (SELECT COALESCE(max(id), 0) FROM subastas_cambios),
+               (SELECT COALESCE(max(id), 0) FROM imagenes),
+               (SELECT COALESCE(max(id), 0) FROM documentos)
+    ''')
+    return tuple(cur.fetchone())
+
+def _sql_exportacion(filtros=None, ids=None, como_float=False):
+    """Consulta de exportación: mismas condiciones que el listado, opcionalmente solo `ids`"""
+    historico = bool(filtros and filtros.get('incluir_archivo'))
+    condiciones, params = _construir_filtros(filtros, historico)
+    if ids:
+        condiciones += " AND s.id = ANY(%s)"
+        params.append(list(ids))
+    
+    columnas = ', '.join(
+        f's.{c}::float8 AS {c}' if como_float and c in COLUMNAS_DECIMALES else f's.{c}'
+        for c in COLUMNAS_EXPORTACION
+    )
+    tabla = 'subastas_historico' if historico else 'subastas'
+    return f"SELECT {columnas} FROM {tabla} s WHERE 1=1{condiciones} ORDER BY s.fecha_inicio DESC", params
+
+# Tamaño de los bloques del CSV que se mandan al cliente
+BLOQUE_CSV = 256 * 1024
+
+def copiar_subastas_csv(filtros=None, ids=None):
+    """Generador con el CSV de la exportación tal cual sale de COPY ... TO STDOUT.
+
+    COPY escribe desde otro hilo en una cola acotada, así que los bloques se
+    envían al cliente según llegan y la memoria no depende del tamaño.
+    psycopg2 llama a write() una vez por fila, así que las filas se agrupan
+    en bloques de BLOQUE_CSV bytes antes de pasarlas a la cola.
+    """
+    conn = get_db_connection(solo_lectura=True)
+    cur = conn.cursor()
+    sql, params = _sql_exportacion(filtros, ids)
+    copia = f"COPY ({cur.mogrify(sql, params).decode()}) TO STDOUT WITH (FORMAT csv, HEADER)"
+    
+    cola = queue.Queue(maxsize=32)
+    fin = object()
+    abandonada = threading.Event()
+    
+    class _Salida:
+        def __init__(self):
+            self.bloque = bytearray()
+        
+        def write(self, datos):
+            self.bloque += datos
+            if len(self.bloque) >= BLOQUE_CSV:
+                self.vaciar()
+        
+        def vaciar(self):
+            if self.bloque and not abandonada.is_set():
+                cola.put(bytes(self.bloque))
+            self.bloque = bytearray()
+    
+    def copiar():
+        try:
+            salida = _Salida()
+            cur.copy_expert(copia, salida)
+            salida.vaciar()
+            cola.put(fin)
+        except Exception as e:
+            cola.put(e)
+    
+    hilo = threading.Thread(target=copiar, daemon=True)
+    hilo.start()
+    try:
+        while True:
+            datos = cola.get()
+            if datos is fin:
+                break
+            if isinstance(datos, Exception):
+                raise datos
+            yield datos
+    finally:
+        if hilo.is_alive():
+            # El cliente se fue a mitad: cancelar COPY y desbloquear al hilo
+            abandonada.set()
+            conn.cancel()
+            while hilo.is_alive():
+                try:
+                    cola.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        hilo.join()
+        cur.close()
+        conn.close()
+
+def leer_subastas_por_lotes(filtros=None, ids=None, lote=50000):
+    """Generador de listas de tuplas (orden de COLUMNAS_EXPORTACION) leídas con un cursor de servidor.
+
+    Los importes llegan como float y no como Decimal.
+    """
+    conn = get_db_connection(solo_lectura=True)
+    cur = conn.cursor(name='exportacion', cursor_factory=psycopg2.extensions.cursor)
+    try:
+        sql, params = _sql_exportacion(filtros, ids, como_float=True)
+        cur.execute(sql, params)
+        while True:
+            filas = cur.fetchmany(lote)
+            if not filas:
+                break
+            yield filas
+    finally:
+        cur.close()
+        conn.close()
+
+def obtener_oportunidades(limite=50, provincia=None, tipo_bien=None):
+    """Subastas abiertas con más descuento sobre la tasación (solo lee idx_oportunidades)"""
+    conn = get_db_connection(solo_lectura=True)
+    cur = conn.cursor()
+    
+    condiciones = ""
+    params = [ESTADOS_ABIERTOS]
+    if provincia:
+        condiciones += " AND provincia = %s"
+        params.append(provincia)
+    if tipo_bien:
+        condiciones += " AND tipo_bien = %s"
+        params.append(tipo_bien)
+    params.append(limite)
+    
+    cur.execute(f'''
+        SELECT id, provincia, tipo_bien, valor_subasta, valor_tasacion,
+               descuento_tasacion, ratio1, ratio2, fecha_conclusion
+        FROM subastas
+        WHERE estado IN %s AND descuento_tasacion IS NOT NULL{condiciones}
+        ORDER BY descuento_tasacion DESC NULLS LAST
+        LIMIT %s
+    ''', params)
+    oportunidades = cur.fetchall()
+    
+    cur.close()
+    conn.close()
+    
+    return oportunidades
+
+def obtener_cambios_json(desde, limite=500, solo_lectura=True):
+    """Cambios posteriores al cursor `desde` como documento JSON.
+
+    Devuelve (texto, cursor nuevo, hay_mas). Cada subasta aparece una vez,
+    con su último cambio y, si sigue viva, con el mismo JSON que el listado.
+    """
+    conn = get_db_connection(solo_lectura=solo_lectura)
+    cur = conn.cursor()
+    
+    cur.execute(f'''
+        WITH pagina AS (
+            SELECT id, subasta_id, tipo, estado, cambiado
+            FROM subastas_cambios
+            WHERE id > %(desde)s
+            ORDER BY id
+            LIMIT %(limite)s
+        ),
+        ultimos AS (
+            SELECT DISTINCT ON (subasta_id) *
+            FROM pagina
+            ORDER BY subasta_id, id DESC
+        )
+        SELECT json_build_object(
+            'success', true,
+            'cursor', (SELECT COALESCE(max(id), %(desde)s) FROM pagina),
+            'mas', (SELECT COUNT(*) FROM pagina) = %(limite)s,
+            'cambios', COALESCE((
+                SELECT json_agg(json_build_object(
+                    'cursor', c.id,
+                    'id', c.subasta_id,
+                    'tipo', c.tipo,
+                    'estado', c.estado,
+                    'cambiado', c.cambiado,
+                    'subasta', (SELECT {_sql_subasta_json()} FROM subastas s WHERE s.id = c.subasta_id)
+                ) ORDER BY c.id)
+                FROM ultimos c
+            ), '[]'::json)
+        )::text AS payload,
+        (SELECT COALESCE(max(id), %(desde)s) FROM pagina) AS cursor,
+        (SELECT COUNT(*) FROM pagina) = %(limite)s AS mas
+    ''', {'desde': desde, 'limite': limite})
+    fila = cur.fetchone()
+    
+    cur.close()
+    conn.close()
+    
+    return fila['payload'], fila['cursor'], fila['mas']
+
 def obtener_imagenes_subasta(subasta_id):
     """Obtener todas las imágenes de una subasta"""
-    conn = get_db_connection()
+    conn = get_db_connection(solo_lectura=True)
     cur = conn.cursor()
     
     cur.execute('SELECT * FROM imagenes WHERE subasta_id = %s', (subasta_id,))
@@ -207,10 +798,10 @@ def obtener_imagenes_subasta(subasta_id):
 
 def obtener_documentos_subasta(subasta_id):
     """Obtener todos los documentos de una subasta"""
-    conn = get_db_connection()
+    conn = get_db_connection(solo_lectura=True)
     cur = conn.cursor()
     
-    cur.execute('SELECT * FROM documentos WHERE subasta_id = %s', (subasta_id,))
+    cur.execute(f'SELECT {COLUMNAS_DOCUMENTO_API} FROM documentos WHERE subasta_id = %s', (subasta_id,))
     documentos = cur.fetchall()
     
     cur.close()
@@ -218,5 +809,269 @@ def obtener_documentos_subasta(subasta_id):
     
     return documentos
 
-if __name__ == '__main__':
-    init_database()
+def obtener_url_adjunto(tipo, adjunto_id, variante=None):
+    """URL guardada de una imagen o documento (vivo o archivado), o None.
+
+    Devuelve la de S3 (la variante pedida si existe) o, si no se subió, la
+    original del BOE. Se mira primero la tabla caliente y solo si no está
+    el archivo, los dos por su clave primaria.
+    """
+    tabla = 'imagenes' if tipo == 'imagen' else 'documentos'
+    columna = f'url_{variante}' if tipo == 'imagen' and variante in ('thumb', 'medium') else 'url_s3'
+    
+    conn = get_db_connection(solo_lectura=True)
+    cur = conn.cursor()
+    fila = None
+    for sufijo in ('', '_archivo'):
+        cur.execute(f'''
+            SELECT COALESCE(NULLIF({columna}, ''), NULLIF(url_s3, ''), url_original) AS url
+            FROM {tabla}{sufijo} WHERE id = %s
+        ''', (adjunto_id,))
+        fila = cur.fetchone()
+        if fila:
+            break
+    cur.close()
+    conn.close()
+    
+    return fila['url'] if fila else None
+
+def obtener_subasta_detalle(subasta_id):
+    """Subasta con sus imágenes, documentos y lotes, esté viva o archivada"""
+    conn = get_db_connection(solo_lectura=True)
+    cur = conn.cursor()
+    
+    detalle = None
+    for sufijo in ('', '_archivo'):
+        cur.execute(f'SELECT * FROM subastas{sufijo} WHERE id = %s', (subasta_id,))
+        subasta = cur.fetchone()
+        if subasta:
+            cur.execute(f'SELECT * FROM imagenes{sufijo} WHERE subasta_id = %s ORDER BY id', (subasta_id,))
+            imagenes = cur.fetchall()
+            cur.execute(f'''
+                SELECT {COLUMNAS_DOCUMENTO_API} FROM documentos{sufijo}
+                WHERE subasta_id = %s ORDER BY id
+            ''', (subasta_id,))
+            documentos = cur.fetchall()
+            cur.execute(f'''
+                SELECT {', '.join(COLUMNAS_LOTE)} FROM lotes{sufijo}
+                WHERE subasta_id = %s ORDER BY numero
+            ''', (subasta_id,))
+            lotes = cur.fetchall()
+            detalle = {
+                'subasta': subasta,
+                'imagenes': imagenes,
+                'documentos': documentos,
+                'lotes': lotes,
+                'archivada': bool(sufijo)
+            }
+            break
+    
+    cur.close()
+    conn.close()
+    
+    return detalle
+
+def archivar_subastas(dias=90, lote=500):
+    """Mover al archivo las subastas concluidas hace más de `dias` días.
+
+    Cada lote se mueve en una sola sentencia (subasta, imágenes,
+    documentos y lotes de la subasta), así que nunca queda a medias. Devuelve cuántas se han
+    archivado.
+    """
+    columnas_sub = ', '.join(COLUMNAS_SUBASTA)
+    columnas_img = ', '.join(COLUMNAS_IMAGEN)
+    columnas_doc = ', '.join(COLUMNAS_DOCUMENTO)
+    columnas_lote = ', '.join(COLUMNAS_LOTE)
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    total = 0
+    
+    try:
+        while True:
+            cur.execute(f'''
+                WITH movidas AS (
+                    SELECT id FROM subastas
+                    WHERE estado IN %(concluidas)s
+                      AND COALESCE(fecha_conclusion, actualizado::date) < CURRENT_DATE - %(dias)s
+                    LIMIT %(lote)s
+                    FOR UPDATE SKIP LOCKED
+                ),
+                imagenes_movidas AS (
+                    DELETE FROM imagenes WHERE subasta_id IN (SELECT id FROM movidas)
+                    RETURNING {columnas_img}
+                ),
+                imagenes_archivadas AS (
+                    INSERT INTO imagenes_archivo ({columnas_img})
+                    SELECT {columnas_img} FROM imagenes_movidas
+                ),
+                documentos_movidos AS (
+                    DELETE FROM documentos WHERE subasta_id IN (SELECT id FROM movidas)
+                    RETURNING {columnas_doc}
+                ),
+                documentos_archivados AS (
+                    INSERT INTO documentos_archivo ({columnas_doc})
+                    SELECT {columnas_doc} FROM documentos_movidos
+                ),
+                lotes_movidos AS (
+                    DELETE FROM lotes WHERE subasta_id IN (SELECT id FROM movidas)
+                    RETURNING {columnas_lote}
+                ),
+                lotes_archivados AS (
+                    INSERT INTO lotes_archivo ({columnas_lote})
+                    SELECT {columnas_lote} FROM lotes_movidos
+                ),
+                subastas_movidas AS (
+                    DELETE FROM subastas WHERE id IN (SELECT id FROM movidas)
+                    RETURNING {columnas_sub}
+                ),
+                cambios AS (
+                    INSERT INTO subastas_cambios (subasta_id, tipo, estado)
+                    SELECT id, 'archivada', estado FROM subastas_movidas
+                ),
+                -- Sin ON CONFLICT: si el id ya está archivado, el lote entero
+                -- se deshace en vez de borrar la subasta viva sin guardarla
+                subastas_archivadas AS (
+                    INSERT INTO subastas_archivo ({columnas_sub})
+                    SELECT {columnas_sub} FROM subastas_movidas
+                )
+                SELECT COUNT(*) AS movidas FROM subastas_movidas
+            ''', {'concluidas': ESTADOS_CONCLUIDOS, 'dias': dias, 'lote': lote})
+            movidas = cur.fetchone()['movidas']
+            conn.commit()
+            total += movidas
+            if movidas < lote:
+                break
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error archivando subastas: {e}")
+    finally:
+        cur.close()
+        conn.close()
+    
+    if total:
+        registrar_escritura()
+        refrescar_estadisticas()
+        print(f"🗄️ {total} subastas concluidas archivadas")
+    
+    return total
+
+# Dimensiones del resumen de estadísticas: nombre -> expresión SQL sobre subastas
+DIMENSIONES_ESTADISTICAS = {
+    'provincia': "provincia",
+    'tipo_bien': "tipo_bien",
+    'estado': "COALESCE(estado, '')",
+    'mes': "to_char(fecha_inicio, 'YYYY-MM')",
+}
+
+def _claves_estadisticas(dimension, subastas):
+    """Claves de una dimensión afectadas por un lote de subastas"""
+    claves = set()
+    for subasta in subastas:
+        if dimension == 'mes':
+            fecha = subasta.get('fecha_inicio')
+            if fecha:
+                claves.add(fecha.strftime('%Y-%m'))
+        elif subasta.get(dimension) is not None:
+            claves.add(subasta[dimension])
+    return sorted(claves)
+
+def refrescar_estadisticas(subastas=None):
+    """Recalcular el resumen de estadísticas.
+
+    Sin argumentos recalcula todas las dimensiones. Con un lote de subastas
+    (los dicts que genera el scraper) solo recalcula los grupos de provincia,
+    tipo de bien y mes que tocan esas subastas. El estado se recalcula siempre
+    entero porque una subasta re-scrapeada suele cambiar de estado y solo hay
+    unos pocos valores.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        for dimension, expresion in DIMENSIONES_ESTADISTICAS.items():
+            filtro = ''
+            params = [dimension]
+
+            if subastas is None or dimension == 'estado':
+                cur.execute('DELETE FROM estadisticas_resumen WHERE dimension = %s', (dimension,))
+            else:
+                claves = _claves_estadisticas(dimension, subastas)
+                if not claves:
+                    continue
+                cur.execute(
+                    'DELETE FROM estadisticas_resumen WHERE dimension = %s AND clave = ANY(%s)',
+                    (dimension, claves)
+                )
+                filtro = f" AND {expresion} = ANY(%s)"
+                params.append(claves)
+                if dimension == 'mes':
+                    # Acotar por fecha para aprovechar idx_fecha_inicio
+                    filtro += " AND fecha_inicio >= %s::date AND fecha_inicio < %s::date + INTERVAL '1 month'"
+                    params.extend([f"{claves[0]}-01", f"{claves[-1]}-01"])
+
+            cur.execute(f'''
+                INSERT INTO estadisticas_resumen (dimension, clave, cantidad, suma_valor, mediana_valor)
+                SELECT %s, {expresion}, COUNT(*), SUM(valor_subasta),
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY valor_subasta)
+                FROM subastas
+                WHERE {expresion} IS NOT NULL{filtro}
+                GROUP BY 2
+            ''', params)
+
+        conn.commit()
+        registrar_escritura()
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error refrescando estadísticas: {e}")
+        return False
+    finally:
+        cur.close()
+        conn.close()
+
+def _leer_resumen_estadisticas():
+    """Leer todas las filas del resumen de estadísticas"""
+    conn = get_db_connection(solo_lectura=True)
+    cur = conn.cursor()
+
+    cur.execute('''
+        SELECT dimension, clave, cantidad, suma_valor, mediana_valor
+        FROM estadisticas_resumen
+        ORDER BY dimension, cantidad DESC, clave
+    ''')
+    filas = cur.fetchall()
+
+    cur.close()
+    conn.close()
+
+    return filas
+
+def obtener_estadisticas():
+    """Obtener el resumen de estadísticas con una sola consulta"""
+    filas = _leer_resumen_estadisticas()
+
+    # Primera llamada sobre una base de datos sin resumen: calcularlo
+    if not filas and refrescar_estadisticas():
+        filas = _leer_resumen_estadisticas()
+
+    return _agrupar_estadisticas(filas)
+
+def _agrupar_estadisticas(filas):
+    """Convertir las filas del resumen al formato de /api/stats"""
+    grupos = {dimension: [] for dimension in DIMENSIONES_ESTADISTICAS}
+    for fila in filas:
+        grupos.setdefault(fila['dimension'], []).append({
+            fila['dimension']: fila['clave'],
+            'cantidad': fila['cantidad'],
+            'suma_valor': float(fila['suma_valor']) if fila['suma_valor'] is not None else None,
+            'mediana_valor': float(fila['mediana_valor']) if fila['mediana_valor'] is not None else None,
+        })
+
+    return {
+        'total': sum(fila['cantidad'] for fila in grupos['estado']),
+        'por_provincia': grupos['provincia'][:10],
+        'por_tipo': grupos['tipo_bien'],
+        'por_estado': grupos['estado'],
+        'por_mes': sorted(grupos['mes'], key=lambda fila: fila['mes'])
+    }
@@ -0,0 +1,240 @@
+"""Ficheros de /api/exportar: Excel, CSV, Parquet y NDJSON comprimido.
+
+Excel es para abrirlo a mano; los demás formatos son para cargar el
+conjunto completo (pandas, DuckDB...) y se generan por bloques sin
+tener todas las filas en memoria.
+
+openpyxl y pyarrow se importan al generar el primer fichero de su
+formato: juntos cuestan más que arrancar el resto de la API.
+"""
+import zlib
+
+import orjson
+
+from database import COLUMNAS_DECIMALES, COLUMNAS_EXPORTACION, copiar_subastas_csv, leer_subastas_por_lotes
+
+# formato -> (mimetype, extensión)
+FORMATOS = {
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'ndjson': ('application/gzip', 'ndjson.gz'),
+}
+
+# Filas por row group de Parquet y por bloque de NDJSON
+FILAS_POR_BLOQUE = 50000
+
+_esquema_parquet = None
+
+def esquema_parquet():
+    """Esquema Arrow de la exportación (los importes como float64)"""
+    global _esquema_parquet
+    if _esquema_parquet is None:
+        import pyarrow as pa
+        tipos = {
+            'fecha_inicio': pa.date32(),
+            'fecha_conclusion': pa.date32(),
+            'fecha_scraping': pa.timestamp('us'),
+            'actualizado': pa.timestamp('us'),
+        }
+        _esquema_parquet = pa.schema([
+            (c, pa.float64() if c in COLUMNAS_DECIMALES else tipos.get(c, pa.string()))
+            for c in COLUMNAS_EXPORTACION
+        ])
+    return _esquema_parquet
+
+def filas_excel(filtros=None, ids=None):
+    """Subastas de la exportación como dicts, leídas con la misma consulta que los demás formatos"""
+    for filas in leer_subastas_por_lotes(filtros, ids):
+        for fila in filas:
+            yield dict(zip(COLUMNAS_EXPORTACION, fila))
+
+def crear_libro_excel(subastas_exportar):
+    """Generar el libro Excel de la exportación"""
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    # Crear Excel
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Subastas BOE"
+
+    # Estilos
+    header_fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF", size=11)
+    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+
+    # Encabezados
+    headers = [
+        "RATIO 1 - cantidad reclamada vs valor subasta",
+        "RATIO 2 - Puja Máxima vs Valor Subasta",
+        "Estado",
+        "Tipo De Subasta",
+        "Tipo Bien",
+        "Id",
+        "Lotes",
+        "Provincia",
+        "Localidad",
+        "Dirección",
+        "Boton google maps",
+        "Descripción",
+        "Referencia Catastral",
+        "Marca",
+        "Modelo",
+        "Matricula",
+        "Cantidad Reclamada",
+        "Valor De Tasacion",
+        "Valor Subasta",
+        "Tramos Entre Pujas",
+        "Puja Mínima",
+        "Puja Máxima",
+        "Importe Del Deposito",
+        "Nombre",
+        "Fecha De Inicio",
+        "Fecha De Conclusión"
+    ]
+
+    # Escribir encabezados
+    for col_num, header in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=col_num)
+        cell.value = header
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = header_alignment
+
+    # Escribir datos
+    for row_num, subasta in enumerate(subastas_exportar, 2):
+        subasta_dict = dict(subasta)
+
+        google_maps_url = ""
+        if subasta_dict.get('latitud') and subasta_dict.get('longitud'):
+            lat = float(subasta_dict['latitud'])
+            lng = float(subasta_dict['longitud'])
+            google_maps_url = f"https://www.google.com/maps/search/?api=1&query={lat},{lng}"
+
+        # RATIO 1
+        ws.cell(row=row_num, column=1).value = f"=IF(Q{row_num}=0,0,(Q{row_num}/S{row_num})*100)"
+        ws.cell(row=row_num, column=1).number_format = '0.00"%"'
+
+        # RATIO 2
+        ws.cell(row=row_num, column=2).value = f"=IF(V{row_num}=0,0,(V{row_num}/S{row_num})*100)"
+        ws.cell(row=row_num, column=2).number_format = '0.00"%"'
+
+        # Resto de columnas
+        ws.cell(row=row_num, column=3).value = subasta_dict.get('estado', '')
+        ws.cell(row=row_num, column=4).value = subasta_dict.get('tipo_subasta', '')
+        ws.cell(row=row_num, column=5).value = subasta_dict.get('tipo_bien', '')
+        ws.cell(row=row_num, column=6).value = subasta_dict.get('id', '')
+        ws.cell(row=row_num, column=7).value = subasta_dict.get('lotes', '')
+        ws.cell(row=row_num, column=8).value = subasta_dict.get('provincia', '')
+        ws.cell(row=row_num, column=9).value = subasta_dict.get('localidad', '')
+        ws.cell(row=row_num, column=10).value = subasta_dict.get('direccion', '')
+
+        if google_maps_url:
+            cell = ws.cell(row=row_num, column=11)
+            cell.value = "Ver en Google Maps"
+            cell.hyperlink = google_maps_url
+            cell.font = Font(color="0563C1", underline="single")
+
+        ws.cell(row=row_num, column=12).value = subasta_dict.get('descripcion', '')
+        ws.cell(row=row_num, column=13).value = subasta_dict.get('referencia_catastral', '')
+        ws.cell(row=row_num, column=14).value = subasta_dict.get('marca', '')
+        ws.cell(row=row_num, column=15).value = subasta_dict.get('modelo', '')
+        ws.cell(row=row_num, column=16).value = subasta_dict.get('matricula', '')
+        ws.cell(row=row_num, column=17).value = float(subasta_dict.get('cantidad_reclamada', 0) or 0)
+        ws.cell(row=row_num, column=18).value = float(subasta_dict.get('valor_tasacion', 0) or 0)
+        ws.cell(row=row_num, column=19).value = float(subasta_dict.get('valor_subasta', 0) or 0)
+        ws.cell(row=row_num, column=20).value = float(subasta_dict.get('tramos_pujas', 0) or 0)
+        ws.cell(row=row_num, column=21).value = float(subasta_dict.get('puja_minima', 0) or 0)
+        ws.cell(row=row_num, column=22).value = float(subasta_dict.get('puja_maxima', 0) or 0)
+        ws.cell(row=row_num, column=23).value = float(subasta_dict.get('importe_deposito', 0) or 0)
+        ws.cell(row=row_num, column=24).value = subasta_dict.get('nombre_acreedor', '')
+
+        # Fechas
+        fecha_inicio = subasta_dict.get('fecha_inicio')
+        if fecha_inicio:
+            ws.cell(row=row_num, column=25).value = fecha_inicio.strftime('%d/%m/%Y') if hasattr(fecha_inicio, 'strftime') else str(fecha_inicio)
+
+        fecha_conclusion = subasta_dict.get('fecha_conclusion')
+        if fecha_conclusion:
+            ws.cell(row=row_num, column=26).value = fecha_conclusion.strftime('%d/%m/%Y') if hasattr(fecha_conclusion, 'strftime') else str(fecha_conclusion)
+
+    # Ajustar anchos de columna
+    column_widths = [35, 35, 12, 15, 12, 18, 15, 12, 15, 40, 20, 50, 25, 15, 15, 12, 18, 18, 15, 18, 15, 15, 18, 40, 15, 18]
+    for col_num, width in enumerate(column_widths, 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = width
+
+    # Congelar primera fila
+    ws.freeze_panes = "A2"
+
+    # Añadir filtros
+    ws.auto_filter.ref = ws.dimensions
+    
+    return wb
+
+def generar_csv(filtros=None, ids=None):
+    """CSV con cabecera, directamente de COPY"""
+    return copiar_subastas_csv(filtros, ids)
+
+def generar_ndjson_gz(filtros=None, ids=None):
+    """Una subasta JSON por línea, comprimido con gzip según se genera"""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for filas in leer_subastas_por_lotes(filtros, ids, FILAS_POR_BLOQUE):
+        lineas = b''.join(
+            orjson.dumps(dict(zip(COLUMNAS_EXPORTACION, fila)), option=orjson.OPT_APPEND_NEWLINE)
+            for fila in filas
+        )
+        bloque = compresor.compress(lineas)
+        if bloque:
+            yield bloque
+    yield compresor.flush()
+
+class _SalidaParquet:
+    """Destino de ParquetWriter que entrega lo escrito a trozos"""
+
+    closed = False
+
+    def __init__(self):
+        self.partes = []
+        self.posicion = 0
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+def generar_parquet(filtros=None, ids=None):
+    """Parquet con un row group por bloque de filas, enviado según se escribe"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = esquema_parquet()
+    salida = _SalidaParquet()
+    writer = pq.ParquetWriter(salida, esquema, compression='zstd')
+    try:
+        for filas in leer_subastas_por_lotes(filtros, ids, FILAS_POR_BLOQUE):
+            columnas = zip(*filas)
+            tabla = pa.Table.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)],
+                schema=esquema
+            )
+            writer.write_table(tabla)
+            yield salida.vaciar()
+    finally:
+        writer.close()
+    yield salida.vaciar()
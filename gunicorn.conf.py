@@ -0,0 +1,32 @@
+"""Configuración de gunicorn para la API.
+
+Por defecto usa workers gthread: cada proceso atiende GUNICORN_THREADS
+peticiones a la vez y el pool de database.py tiene el mismo tamaño, así que
+un listado o una exportación lenta ya no bloquea un worker entero.
+
+Con GUNICORN_WORKER_CLASS=gevent cada proceso atiende cientos de conexiones
+con greenlets; psycogreen pone psycopg2 en modo asíncrono para que las
+consultas cedan el control mientras esperan a PostgreSQL. Conviene subir
+DB_POOL_MAX hasta el límite de conexiones del plan de PostgreSQL.
+
+El stream SSE de /api/subastas/stream deja la petición abierta: con gthread
+cada cliente conectado ocupa un hilo. app.py limita los streams por proceso
+(SSE_MAX_STREAMS, por defecto una cuarta parte de los hilos) y los cierra
+cada SSE_DURACION_SEGUNDOS; por encima del límite el frontend consulta
+/api/subastas/changes. Con muchos clientes conviene gevent.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 200))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+keepalive = 5
+
+def post_fork(server, worker):
+    """Activar el camino asíncrono de psycopg2 en los workers gevent"""
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
@@ -0,0 +1,105 @@
+"""Métricas del scraper: contadores, histogramas de latencia y colas.
+
+Se acumulan en memoria del proceso worker; mientras corre un scraping,
+tareas.py guarda una instantánea en scraping_ejecuciones.metricas cada
+SCRAPING_METRICAS_SEGUNDOS (las colas se ven con trabajo en vuelo, no solo
+entre búsquedas) y la API la sirve en /api/scraping/metrics (JSON o
+formato de texto de Prometheus).
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites superiores de los buckets de latencia, en segundos
+BUCKETS_SEGUNDOS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+_contadores = {}
+_histogramas = {}
+_colas = {}
+
+def incrementar(nombre, valor=1):
+    """Sumar a un contador"""
+    with _lock:
+        _contadores[nombre] = _contadores.get(nombre, 0) + valor
+
+def observar(etapa, segundos):
+    """Registrar la duración de una etapa en su histograma"""
+    with _lock:
+        histograma = _histogramas.get(etapa)
+        if histograma is None:
+            histograma = {'buckets': [0] * (len(BUCKETS_SEGUNDOS) + 1), 'suma': 0.0, 'cuenta': 0}
+            _histogramas[etapa] = histograma
+
+        indice = len(BUCKETS_SEGUNDOS)
+        for i, limite in enumerate(BUCKETS_SEGUNDOS):
+            if segundos <= limite:
+                indice = i
+                break
+        histograma['buckets'][indice] += 1
+        histograma['suma'] += segundos
+        histograma['cuenta'] += 1
+
+def fijar_cola(nombre, tamano):
+    """Fijar la profundidad actual de una cola entre etapas"""
+    with _lock:
+        _colas[nombre] = tamano
+
+@contextmanager
+def cronometro(etapa):
+    """Medir un bloque y registrarlo en el histograma de la etapa"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(etapa, time.perf_counter() - inicio)
+
+def instantanea():
+    """Copia serializable de todas las métricas"""
+    with _lock:
+        return {
+            'contadores': dict(_contadores),
+            'histogramas': {
+                etapa: {
+                    'buckets': list(h['buckets']),
+                    'suma': round(h['suma'], 6),
+                    'cuenta': h['cuenta']
+                }
+                for etapa, h in _histogramas.items()
+            },
+            'colas': dict(_colas)
+        }
+
+def reiniciar():
+    """Vaciar las métricas (al empezar una ejecución)"""
+    with _lock:
+        _contadores.clear()
+        _histogramas.clear()
+        _colas.clear()
+
+def formato_prometheus(datos, prefijo='scraper'):
+    """Renderizar una instantánea en el formato de texto de Prometheus"""
+    lineas = []
+
+    for nombre, valor in sorted(datos.get('contadores', {}).items()):
+        metrica = f"{prefijo}_{nombre}_total"
+        lineas.append(f"# TYPE {metrica} counter")
+        lineas.append(f"{metrica} {valor}")
+
+    for etapa, h in sorted(datos.get('histogramas', {}).items()):
+        metrica = f"{prefijo}_{etapa}_segundos"
+        lineas.append(f"# TYPE {metrica} histogram")
+        acumulado = 0
+        for limite, cuenta in zip(BUCKETS_SEGUNDOS, h['buckets']):
+            acumulado += cuenta
+            lineas.append(f'{metrica}_bucket{{le="{limite}"}} {acumulado}')
+        lineas.append(f'{metrica}_bucket{{le="+Inf"}} {h["cuenta"]}')
+        lineas.append(f"{metrica}_sum {h['suma']}")
+        lineas.append(f"{metrica}_count {h['cuenta']}")
+
+    for nombre, tamano in sorted(datos.get('colas', {}).items()):
+        metrica = f"{prefijo}_cola_{nombre}"
+        lineas.append(f"# TYPE {metrica} gauge")
+        lineas.append(f"{metrica} {tamano}")
+
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,430 @@
+"""Migraciones versionadas del esquema de la base de datos.
+
+Cada migración tiene un número de versión y se aplica una sola vez; las
+aplicadas quedan en la tabla schema_version. Se ejecutan en orden con
+`python migraciones.py` (fase release del Procfile), nunca al arrancar la
+API ni el worker. Un advisory lock evita que dos despliegues migren a la vez.
+
+Las migraciones transaccionales se aplican enteras o nada. Las que crean
+índices sobre tablas con datos no son transaccionales y usan
+crear_indice_concurrente, que no bloquea las escrituras mientras se
+construye el índice.
+
+Uso:
+    python migraciones.py               aplicar las pendientes
+    python migraciones.py --hasta 3     aplicar hasta la versión 3
+    python migraciones.py estado        listar aplicadas y pendientes
+"""
+import argparse
+import sys
+import time
+
+from database import (
+    get_db_connection, COLUMNAS_CALCULADAS, ESTADOS_ABIERTOS, ESTADOS_CONCLUIDOS
+)
+
+# Distinto del de tareas.LOCK_SCRAPING
+LOCK_MIGRACIONES = 7270736902
+
+def crear_indice_concurrente(cur, nombre, definicion, unico=False, params=None):
+    """CREATE INDEX CONCURRENTLY (fuera de transacción).
+
+    Si un intento anterior se quedó a medias, PostgreSQL deja el índice
+    marcado como no válido: se borra y se vuelve a construir.
+    """
+    cur.execute('''
+        SELECT i.indisvalid
+        FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = %s
+    ''', (nombre,))
+    fila = cur.fetchone()
+    if fila and fila['indisvalid']:
+        return
+    if fila:
+        cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {nombre}')
+    cur.execute(f'CREATE {"UNIQUE " if unico else ""}INDEX CONCURRENTLY IF NOT EXISTS {nombre} ON {definicion}', params)
+
+def _v1_esquema_inicial(cur):
+    """Esquema base (subastas, imágenes y documentos): idempotente, así que
+    en bases de datos ya existentes solo registra la versión"""
+    # Tabla principal de subastas
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS subastas (
+            id VARCHAR(50) PRIMARY KEY,
+            titulo TEXT,
+            descripcion TEXT,
+            tipo_bien VARCHAR(100),
+            tipo_subasta VARCHAR(100),
+            estado VARCHAR(100),
+            lotes TEXT,
+            provincia VARCHAR(100),
+            localidad VARCHAR(200),
+            direccion TEXT,
+            latitud DECIMAL(10, 8),
+            longitud DECIMAL(11, 8),
+            referencia_catastral VARCHAR(100),
+            marca VARCHAR(100),
+            modelo VARCHAR(100),
+            matricula VARCHAR(50),
+            cantidad_reclamada DECIMAL(15, 2),
+            valor_tasacion DECIMAL(15, 2),
+            valor_subasta DECIMAL(15, 2),
+            tramos_pujas DECIMAL(15, 2),
+            puja_minima DECIMAL(15, 2),
+            puja_maxima DECIMAL(15, 2),
+            importe_deposito DECIMAL(15, 2),
+            nombre_acreedor TEXT,
+            fecha_inicio DATE,
+            fecha_conclusion DATE,
+            url_detalle TEXT,
+            fecha_scraping TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            actualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Tabla de imágenes
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS imagenes (
+            id SERIAL PRIMARY KEY,
+            subasta_id VARCHAR(50) REFERENCES subastas(id) ON DELETE CASCADE,
+            nombre VARCHAR(255),
+            url_original TEXT,
+            url_s3 TEXT,
+            size_bytes INTEGER,
+            fecha_descarga TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Tabla de documentos
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS documentos (
+            id SERIAL PRIMARY KEY,
+            subasta_id VARCHAR(50) REFERENCES subastas(id) ON DELETE CASCADE,
+            nombre VARCHAR(255),
+            tipo VARCHAR(50),
+            url_original TEXT,
+            url_s3 TEXT,
+            size_bytes INTEGER,
+            fecha_descarga TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Índices para mejorar búsquedas
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_provincia ON subastas(provincia)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_tipo_bien ON subastas(tipo_bien)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_estado ON subastas(estado)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_fecha_inicio ON subastas(fecha_inicio)')
+
+def _v2_indices_adjuntos(cur):
+    """Imágenes y documentos por subasta sin recorrer la tabla entera"""
+    crear_indice_concurrente(cur, 'idx_imagenes_subasta', 'imagenes (subasta_id)')
+    crear_indice_concurrente(cur, 'idx_documentos_subasta', 'documentos (subasta_id)')
+
+def _v3_lotes(cur):
+    """Lotes de cada subasta con sus importes, antes solo como texto en subastas.lotes"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS lotes (
+            id SERIAL PRIMARY KEY,
+            subasta_id VARCHAR(50) NOT NULL REFERENCES subastas(id) ON DELETE CASCADE,
+            numero INTEGER NOT NULL,
+            descripcion TEXT,
+            referencia_catastral VARCHAR(100),
+            localidad VARCHAR(200),
+            direccion TEXT,
+            valor_tasacion DECIMAL(15, 2),
+            valor_subasta DECIMAL(15, 2),
+            tramos_pujas DECIMAL(15, 2),
+            puja_minima DECIMAL(15, 2),
+            importe_deposito DECIMAL(15, 2),
+            descripcion_tsv tsvector GENERATED ALWAYS AS (to_tsvector('spanish', COALESCE(descripcion, ''))) STORED,
+            UNIQUE (subasta_id, numero)
+        )
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_lotes_texto ON lotes USING GIN (descripcion_tsv)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_lotes_valor_subasta ON lotes(valor_subasta)')
+    
+    # Mismas columnas y en el mismo orden, para la vista lotes_historico
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS lotes_archivo (
+            LIKE lotes INCLUDING DEFAULTS INCLUDING GENERATED
+        )
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_lotes_archivo_subasta ON lotes_archivo(subasta_id)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_lotes_archivo_texto ON lotes_archivo USING GIN (descripcion_tsv)')
+    cur.execute('''
+        CREATE OR REPLACE VIEW lotes_historico AS
+        SELECT * FROM lotes UNION ALL SELECT * FROM lotes_archivo
+    ''')
+
+def _vistas_historico(cur, tablas=('subastas', 'imagenes', 'documentos')):
+    """Vistas con vivas + archivadas. SELECT * se expande al crear la vista,
+    así que hay que rehacerlas cada vez que se añaden columnas"""
+    for tabla in tablas:
+        cur.execute(f'''
+            CREATE OR REPLACE VIEW {tabla}_historico AS
+            SELECT * FROM {tabla} UNION ALL SELECT * FROM {tabla}_archivo
+        ''')
+
+def _v4_estadisticas_resumen(cur):
+    """Resumen de estadísticas (lo mantiene el scraper tras cada lote)"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS estadisticas_resumen (
+            dimension VARCHAR(20),
+            clave VARCHAR(200),
+            cantidad INTEGER,
+            suma_valor DECIMAL(18, 2),
+            mediana_valor DECIMAL(15, 2),
+            actualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (dimension, clave)
+        )
+    ''')
+
+def _v5_scraping_ejecuciones(cur):
+    """Ejecuciones del scraper (ver tareas.py)"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS scraping_ejecuciones (
+            id SERIAL PRIMARY KEY,
+            tipo VARCHAR(20) DEFAULT 'completo',
+            estado VARCHAR(20) DEFAULT 'pendiente',
+            cancelar BOOLEAN DEFAULT FALSE,
+            progreso JSONB DEFAULT '{}'::jsonb,
+            error TEXT,
+            creado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            inicio TIMESTAMP,
+            fin TIMESTAMP
+        )
+    ''')
+    cur.execute('ALTER TABLE scraping_ejecuciones ADD COLUMN IF NOT EXISTS metricas JSONB')
+    # Como mucho una ejecución pendiente o en curso
+    cur.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_scraping_activo
+        ON scraping_ejecuciones ((TRUE)) WHERE estado IN ('pendiente', 'en_curso')
+    ''')
+
+def _v6_archivo(cur):
+    """Archivo de subastas concluidas (ver archivar_subastas). Las tablas
+    calientes solo guardan subastas vivas o recientes, así que el coste de
+    los listados no crece con el histórico"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS subastas_archivo (
+            LIKE subastas INCLUDING DEFAULTS,
+            PRIMARY KEY (id)
+        )
+    ''')
+    cur.execute('CREATE TABLE IF NOT EXISTS imagenes_archivo (LIKE imagenes INCLUDING DEFAULTS)')
+    cur.execute('CREATE TABLE IF NOT EXISTS documentos_archivo (LIKE documentos INCLUDING DEFAULTS)')
+    # Tablas nuevas (vacías): sus índices se crean dentro de la transacción
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_imagenes_archivo_subasta ON imagenes_archivo(subasta_id)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_documentos_archivo_subasta ON documentos_archivo(subasta_id)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_archivo_provincia ON subastas_archivo(provincia)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_archivo_fecha_inicio ON subastas_archivo(fecha_inicio)')
+    _vistas_historico(cur)
+
+def _v7_indice_archivado(cur):
+    """Índice para encontrar rápido lo que hay que archivar"""
+    crear_indice_concurrente(
+        cur, 'idx_concluidas_fecha', 'subastas (fecha_conclusion) WHERE estado IN %s',
+        params=(ESTADOS_CONCLUIDOS,)
+    )
+
+def _v8_miniaturas(cur):
+    """Miniaturas WebP generadas por el scraper"""
+    for tabla in ('imagenes', 'imagenes_archivo'):
+        cur.execute(f'ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS url_thumb TEXT')
+        cur.execute(f'ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS url_medium TEXT')
+    _vistas_historico(cur, ('imagenes',))
+
+def _v9_texto_documentos(cur):
+    """Texto extraído de los PDFs, con su tsvector para la búsqueda de texto completo"""
+    for tabla in ('documentos', 'documentos_archivo'):
+        cur.execute(f'ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS texto TEXT')
+        cur.execute(f'''
+            ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS texto_tsv tsvector
+            GENERATED ALWAYS AS (to_tsvector('spanish', COALESCE(texto, ''))) STORED
+        ''')
+    _vistas_historico(cur, ('documentos',))
+
+def _v10_indices_texto_documentos(cur):
+    """Índices GIN de la búsqueda en documentos, sin bloquear al scraper"""
+    for tabla in ('documentos', 'documentos_archivo'):
+        crear_indice_concurrente(cur, f'idx_{tabla}_texto', f'{tabla} USING GIN (texto_tsv)')
+
+def _v11_ratios(cur):
+    """Ratios de inversión calculados por PostgreSQL, para ordenar y filtrar.
+    NUMERIC sin precisión: con un valor de subasta casi nulo el ratio no cabe
+    en ninguna escala fija"""
+    for tabla in ('subastas', 'subastas_archivo'):
+        for columna, expresion in COLUMNAS_CALCULADAS.items():
+            cur.execute(f'''
+                ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS {columna} NUMERIC
+                GENERATED ALWAYS AS ({expresion}) STORED
+            ''')
+    _vistas_historico(cur, ('subastas',))
+
+def _v12_indices_ratios(cur):
+    """Índices para ordenar y filtrar por ratio, sin bloquear al scraper"""
+    for columna in COLUMNAS_CALCULADAS:
+        crear_indice_concurrente(cur, f'idx_subastas_{columna}', f'subastas ({columna})')
+    # Mejores oportunidades abiertas: el índice cubre todo lo que devuelve
+    # obtener_oportunidades, así que se resuelve con un index-only scan
+    crear_indice_concurrente(cur, 'idx_oportunidades', '''
+        subastas (descuento_tasacion DESC NULLS LAST)
+        INCLUDE (id, provincia, tipo_bien, valor_subasta, valor_tasacion, ratio1, ratio2, fecha_conclusion)
+        WHERE estado IN %s
+    ''', params=(ESTADOS_ABIERTOS,))
+
+def _v13_cambios_subastas(cur):
+    """Registro de cambios de subastas para sincronizar clientes por cursor
+    (/api/subastas/changes y el stream SSE). Todo el que escribe (scraping,
+    también desde `python scraper.py`, y archivado) lo hace con el advisory
+    lock tareas.LOCK_SCRAPING, así que el orden del id coincide con el de
+    commit"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS subastas_cambios (
+            id BIGSERIAL PRIMARY KEY,
+            subasta_id VARCHAR(50) NOT NULL,
+            tipo VARCHAR(20) NOT NULL,
+            estado VARCHAR(100),
+            cambiado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute('''
+        CREATE OR REPLACE FUNCTION notificar_cambios_subastas() RETURNS trigger AS $$
+        BEGIN
+            -- El trigger por sentencia salta aunque no se inserte nada (upserts sin cambios)
+            IF EXISTS (SELECT 1 FROM nuevos) THEN
+                PERFORM pg_notify('subastas_cambios', (SELECT max(id) FROM nuevos)::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    cur.execute('DROP TRIGGER IF EXISTS trg_notificar_cambios ON subastas_cambios')
+    cur.execute('''
+        CREATE TRIGGER trg_notificar_cambios
+        AFTER INSERT ON subastas_cambios
+        REFERENCING NEW TABLE AS nuevos
+        FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambios_subastas()
+    ''')
+
+def _v14_claves_archivo(cur):
+    """Clave primaria en id para los adjuntos y lotes archivados (LIKE no la
+    copia): sin ella buscar un adjunto por id recorre todo el histórico.
+    El índice único se construye en concurrente y después pasa a ser la clave"""
+    for tabla in ('imagenes_archivo', 'documentos_archivo', 'lotes_archivo'):
+        crear_indice_concurrente(cur, f'{tabla}_pkey', f'{tabla} (id)', unico=True)
+        cur.execute("SELECT 1 FROM pg_constraint WHERE conname = %s", (f'{tabla}_pkey',))
+        if not cur.fetchone():
+            cur.execute(f'ALTER TABLE {tabla} ADD CONSTRAINT {tabla}_pkey PRIMARY KEY USING INDEX {tabla}_pkey')
+
+# (versión, nombre, función, transaccional), en orden. Las bases de datos
+# existentes las creó el antiguo init_db() al arrancar la API, sin
+# schema_version: la versión 1 es ese mismo esquema y, como es idempotente,
+# en ellas solo se registra; de la 2 en adelante se aplica todo
+MIGRACIONES = [
+    (1, 'esquema_inicial', _v1_esquema_inicial, True),
+    (2, 'indices_adjuntos', _v2_indices_adjuntos, False),
+    (3, 'lotes', _v3_lotes, True),
+    (4, 'estadisticas_resumen', _v4_estadisticas_resumen, True),
+    (5, 'scraping_ejecuciones', _v5_scraping_ejecuciones, True),
+    (6, 'archivo', _v6_archivo, True),
+    (7, 'indice_archivado', _v7_indice_archivado, False),
+    (8, 'miniaturas', _v8_miniaturas, True),
+    (9, 'texto_documentos', _v9_texto_documentos, True),
+    (10, 'indices_texto_documentos', _v10_indices_texto_documentos, False),
+    (11, 'ratios', _v11_ratios, True),
+    (12, 'indices_ratios', _v12_indices_ratios, False),
+    (13, 'cambios_subastas', _v13_cambios_subastas, True),
+    (14, 'claves_archivo', _v14_claves_archivo, False),
+]
+assert [m[0] for m in MIGRACIONES] == sorted({m[0] for m in MIGRACIONES}), "Versiones repetidas o desordenadas"
+
+def _versiones_aplicadas(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            aplicada TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duracion_ms INTEGER
+        )
+    ''')
+    cur.execute('SELECT version, aplicada FROM schema_version')
+    return {fila['version']: fila['aplicada'] for fila in cur.fetchall()}
+
+def migrar(hasta=None):
+    """Aplicar en orden las migraciones pendientes. Devuelve cuántas se han aplicado"""
+    conn = get_db_connection()
+    conn.autocommit = True
+    cur = conn.cursor()
+    aplicadas_ahora = 0
+    
+    try:
+        cur.execute('SELECT pg_advisory_lock(%s)', (LOCK_MIGRACIONES,))
+        aplicadas = _versiones_aplicadas(cur)
+        
+        for version, nombre, funcion, transaccional in MIGRACIONES:
+            if version in aplicadas or (hasta is not None and version > hasta):
+                continue
+            
+            print(f"🔧 Migración {version}: {nombre}")
+            inicio = time.perf_counter()
+            conn.autocommit = not transaccional
+            try:
+                funcion(cur)
+                cur.execute(
+                    'INSERT INTO schema_version (version, nombre, duracion_ms) VALUES (%s, %s, %s)',
+                    (version, nombre, round((time.perf_counter() - inicio) * 1000))
+                )
+                if transaccional:
+                    conn.commit()
+            except Exception:
+                if transaccional:
+                    conn.rollback()
+                raise
+            finally:
+                conn.autocommit = True
+            aplicadas_ahora += 1
+        
+        print(f"✅ Esquema al día ({aplicadas_ahora} migraciones aplicadas)")
+        return aplicadas_ahora
+    finally:
+        try:
+            cur.execute('SELECT pg_advisory_unlock_all()')
+        except Exception:
+            pass
+        cur.close()
+        conn.close()
+
+def estado():
+    """Listar las migraciones con su fecha de aplicación o como pendientes"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        aplicadas = _versiones_aplicadas(cur)
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    
+    for version, nombre, _, _ in MIGRACIONES:
+        cuando = aplicadas.get(version)
+        print(f"{version:>4}  {nombre:<30} {cuando.strftime('%Y-%m-%d %H:%M') if cuando else 'pendiente'}")
+    return aplicadas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('accion', nargs='?', choices=['migrar', 'estado'], default='migrar')
+    parser.add_argument('--hasta', type=int, help='última versión a aplicar')
+    args = parser.parse_args()
+    
+    try:
+        if args.accion == 'estado':
+            estado()
+        else:
+            migrar(args.hasta)
+    except Exception as e:
+        print(f"❌ Error migrando la base de datos: {e}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Avisos de cambios de subastas por LISTEN/NOTIFY para el stream SSE.
+
+Un único hilo por proceso escucha el canal 'subastas_cambios' con su
+propia conexión (fuera del pool, porque queda ocupada para siempre) y
+despierta a todos los streams abiertos. Los streams leen después los
+cambios por cursor con obtener_cambios_json, así que un aviso perdido
+solo retrasa la entrega hasta el siguiente aviso o el latido.
+"""
+import select
+import threading
+import time
+
+import psycopg2
+
+from database import DATABASE_URL
+
+CANAL = 'subastas_cambios'
+
+_condicion = threading.Condition()
+_ultimo_cursor = 0
+_hilo = None
+_hilo_lock = threading.Lock()
+
+def _escuchar():
+    global _ultimo_cursor
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(DATABASE_URL)
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f'LISTEN {CANAL}')
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    cursor = max(int(n.payload or 0) for n in conn.notifies)
+                    conn.notifies.clear()
+                    with _condicion:
+                        _ultimo_cursor = max(_ultimo_cursor, cursor)
+                        _condicion.notify_all()
+        except Exception as e:
+            print(f"⚠️ Escucha de cambios interrumpida: {e}")
+            time.sleep(5)
+        finally:
+            if conn is not None:
+                conn.close()
+
+def iniciar():
+    """Arrancar el hilo de escucha si aún no está en marcha (tras el fork de gunicorn)"""
+    global _hilo
+    with _hilo_lock:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_escuchar, name='escucha-cambios', daemon=True)
+            _hilo.start()
+
+def esperar(cursor, timeout):
+    """Esperar a que haya cambios posteriores a `cursor`; False si vence el timeout"""
+    with _condicion:
+        return _condicion.wait_for(lambda: _ultimo_cursor > cursor, timeout)
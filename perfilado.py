@@ -0,0 +1,197 @@
+"""Instrumentación opcional de la API (PERF_ENABLED=1).
+
+- Tiempo por petición, con el reparto entre SQL y secciones marcadas en
+  app.py (serialización, Excel...).
+- Registro de consultas lentas (SLOW_QUERY_MS) con su plan EXPLAIN; el
+  cronómetro lo pone el cursor de database.py.
+- Perfilador por muestreo de la petición, activable con la cabecera
+  X-Perf-Profile: 1 o con PERF_PROFILE=1 para todas. No funciona con
+  workers gevent: ahí todas las peticiones comparten hilo.
+
+Los datos viven en memoria de cada proceso y se consultan en
+/api/debug/perf.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+PERF_ACTIVO = os.getenv('PERF_ENABLED') == '1'
+PERFILAR_SIEMPRE = os.getenv('PERF_PROFILE') == '1'
+UMBRAL_CONSULTA_LENTA_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+INTERVALO_MUESTREO = float(os.getenv('PERF_PROFILE_INTERVALO_MS', 5)) / 1000
+
+_peticiones = deque(maxlen=500)
+_consultas_lentas = deque(maxlen=50)
+_perfiles = deque(maxlen=10)
+_local = threading.local()
+
+class MuestreadorPerfil(threading.Thread):
+    """Toma muestras periódicas de la pila de un hilo y cuenta las más vistas"""
+
+    def __init__(self, hilo_id):
+        super().__init__(daemon=True)
+        self.hilo_id = hilo_id
+        self.pilas = Counter()
+        self.muestras = 0
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(INTERVALO_MUESTREO):
+            frame = sys._current_frames().get(self.hilo_id)
+            if frame is None:
+                continue
+            pila = []
+            while frame is not None and len(pila) < 40:
+                codigo = frame.f_code
+                pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.pilas[';'.join(reversed(pila))] += 1
+            self.muestras += 1
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+def muestreo_disponible():
+    """El muestreador mira la pila del hilo de la petición. Con gevent todos
+    los greenlets comparten hilo y las muestras serían de cualquiera de
+    ellos (o del hub), así que no se perfila"""
+    if 'gevent' not in sys.modules:
+        return True
+    from gevent import monkey
+    return not monkey.is_module_patched('threading')
+
+def _estado():
+    """Acumulador de la petición en curso en este hilo, o None"""
+    return getattr(_local, 'peticion', None)
+
+def registrar_consulta(sql, segundos, explicar=None):
+    """Anotar una consulta; si es lenta, guardarla con su plan"""
+    estado = _estado()
+    if estado is not None:
+        estado['sql_ms'] += segundos * 1000
+        estado['consultas'] += 1
+
+    if segundos * 1000 < UMBRAL_CONSULTA_LENTA_MS:
+        return
+
+    plan = None
+    if explicar is not None:
+        try:
+            plan = explicar()
+        except Exception as e:
+            plan = f"EXPLAIN no disponible: {e}"
+
+    _consultas_lentas.append({
+        'sql': ' '.join(sql.split())[:2000],
+        'ms': round(segundos * 1000, 2),
+        'ruta': estado['ruta'] if estado else None,
+        'plan': plan,
+        'fecha': time.time()
+    })
+
+@contextmanager
+def seccion(nombre):
+    """Medir un tramo de la petición en curso (serialización, Excel...)"""
+    estado = _estado()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if estado is not None:
+            ms = (time.perf_counter() - inicio) * 1000
+            estado['secciones'][nombre] = estado['secciones'].get(nombre, 0) + ms
+
+def instalar(app):
+    """Registrar los hooks de Flask si PERF_ENABLED=1"""
+    if not PERF_ACTIVO:
+        return
+
+    from flask import request
+
+    @app.before_request
+    def _inicio_peticion():
+        _local.peticion = {
+            'ruta': request.url_rule.rule if request.url_rule else request.path,
+            'inicio': time.perf_counter(),
+            'sql_ms': 0.0,
+            'consultas': 0,
+            'secciones': {}
+        }
+        if ((PERFILAR_SIEMPRE or request.headers.get('X-Perf-Profile') == '1')
+                and muestreo_disponible()):
+            muestreador = MuestreadorPerfil(threading.get_ident())
+            muestreador.start()
+            _local.peticion['muestreador'] = muestreador
+
+    @app.teardown_request
+    def _fin_peticion(_error=None):
+        estado = _estado()
+        if estado is None:
+            return
+        _local.peticion = None
+
+        total_ms = (time.perf_counter() - estado['inicio']) * 1000
+        _peticiones.append({
+            'ruta': estado['ruta'],
+            'total_ms': round(total_ms, 2),
+            'sql_ms': round(estado['sql_ms'], 2),
+            'consultas': estado['consultas'],
+            'secciones': {k: round(v, 2) for k, v in estado['secciones'].items()}
+        })
+
+        muestreador = estado.get('muestreador')
+        if muestreador:
+            muestreador.parar()
+            _perfiles.append({
+                'ruta': estado['ruta'],
+                'total_ms': round(total_ms, 2),
+                'muestras': muestreador.muestras,
+                'pilas': [
+                    {'pila': pila, 'muestras': n}
+                    for pila, n in muestreador.pilas.most_common(25)
+                ]
+            })
+
+def _percentil(valores, p):
+    """Percentil sencillo sobre una lista ordenada"""
+    if not valores:
+        return None
+    indice = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[indice]
+
+def informe():
+    """Resumen de lo medido en este proceso"""
+    por_ruta = {}
+    for peticion in list(_peticiones):
+        por_ruta.setdefault(peticion['ruta'], []).append(peticion)
+
+    rutas = {}
+    for ruta, peticiones in por_ruta.items():
+        totales = sorted(p['total_ms'] for p in peticiones)
+        secciones = {}
+        for p in peticiones:
+            for nombre, ms in p['secciones'].items():
+                secciones[nombre] = secciones.get(nombre, 0) + ms
+        rutas[ruta] = {
+            'peticiones': len(peticiones),
+            'p50_ms': _percentil(totales, 50),
+            'p95_ms': _percentil(totales, 95),
+            'max_ms': totales[-1],
+            'sql_ms_medio': round(sum(p['sql_ms'] for p in peticiones) / len(peticiones), 2),
+            'secciones_ms_medio': {k: round(v / len(peticiones), 2) for k, v in secciones.items()}
+        }
+
+    return {
+        'activo': PERF_ACTIVO,
+        'pid': os.getpid(),
+        'umbral_consulta_lenta_ms': UMBRAL_CONSULTA_LENTA_MS,
+        'muestreo_disponible': muestreo_disponible(),
+        'rutas': rutas,
+        'ultimas_peticiones': list(_peticiones)[-20:],
+        'consultas_lentas': list(_consultas_lentas),
+        'perfiles': list(_perfiles)
+    }
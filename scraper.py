@@ -1,29 +1,46 @@
 
 import requests
 from bs4 import BeautifulSoup
-import boto3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as TiempoAgotado
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from PIL import Image, ImageOps
+from pypdf import PdfReader
+import io
+import multiprocessing
+import tempfile
 import time
 import os
 import re
-from database import insertar_subasta, insertar_imagen, insertar_documento
-
-# Configuración AWS S3
-AWS_ACCESS_KEY = os.getenv('AWS_ACCESS_KEY')
-AWS_SECRET_KEY = os.getenv('AWS_SECRET_KEY')
-AWS_BUCKET = os.getenv('AWS_BUCKET', 'auctionbrokers-files')
-AWS_REGION = os.getenv('AWS_REGION', 'eu-west-3')
-
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=AWS_REGION
-)
+import metricas
+from metricas import cronometro
+from almacenamiento import subir_bytes, subir_fichero
+from database import insertar_subasta, insertar_imagen, insertar_documento, refrescar_estadisticas
 
 # Configuración del scraper
-BASE_URL = 'https://subastas.boe.es'
+BASE_URL = os.getenv('BOE_BASE_URL', 'https://subastas.boe.es')
 SEARCH_URL = f'{BASE_URL}/subastas_ava.php'
+NOMINATIM_URL = os.getenv('NOMINATIM_URL', 'https://nominatim.openstreetmap.org/search')
+
+# Miniaturas de las fotos: lado máximo en px de cada versión
+DERIVADOS = {'thumb': 320, 'medium': 1024}
+HILOS_IMAGENES = int(os.getenv('SCRAPER_HILOS_IMAGENES', 4))
+_ejecutor_imagenes = None
+
+# Extracción de texto de los PDFs, en procesos aparte (es CPU pura)
+PROCESOS_PDF = int(os.getenv('SCRAPER_PROCESOS_PDF', os.cpu_count() or 2))
+PDF_MAX_PAGINAS = int(os.getenv('SCRAPER_PDF_MAX_PAGINAS', 50))
+# tsvector no admite más de 1MB; con esto sobra para edictos y tasaciones
+PDF_MAX_CARACTERES = 200000
+# Los PDF más grandes se suben a S3 pero no se les extrae el texto
+PDF_MAX_BYTES_TEXTO = int(os.getenv('SCRAPER_PDF_MAX_MB_TEXTO', 100)) * 1024 * 1024
+# pypdf puede colgarse con PDFs malformados: pasado este tiempo se sigue sin texto
+PDF_TIMEOUT = float(os.getenv('SCRAPER_PDF_TIMEOUT_SEGUNDOS', 120))
+_ejecutor_pdf = None
+
+# Pausas de cortesía con el BOE, en segundos
+PAUSA_DETALLE = float(os.getenv('SCRAPER_PAUSA_DETALLE', 1))
+PAUSA_BUSQUEDA = float(os.getenv('SCRAPER_PAUSA_BUSQUEDA', 2))
 
 # Provincias españolas
 PROVINCIAS = [
@@ -72,26 +89,14 @@ ESTADOS = [
     'Finalizada por autoridad gestora'
 ]
 
-def subir_archivo_s3(archivo_bytes, ruta_s3, content_type='application/octet-stream'):
-    """Subir archivo a AWS S3"""
-    try:
-        s3_client.put_object(
-            Bucket=AWS_BUCKET,
-            Key=ruta_s3,
-            Body=archivo_bytes,
-            ContentType=content_type,
-            ACL='public-read'
-        )
-        url_s3 = f"https://{AWS_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{ruta_s3}"
-        return url_s3
-    except Exception as e:
-        print(f"❌ Error subiendo a S3: {e}")
-        return None
+# Estados que revisan las ejecuciones incrementales
+ESTADOS_VIVOS = ['Próxima apertura', 'Celebrándose']
 
 def descargar_archivo(url):
     """Descargar archivo desde URL"""
     try:
-        response = requests.get(url, timeout=30)
+        with cronometro('descarga_archivo'):
+            response = requests.get(url, timeout=30)
         if response.status_code == 200:
             return response.content
         return None
@@ -99,6 +104,68 @@ def descargar_archivo(url):
         print(f"❌ Error descargando {url}: {e}")
         return None
 
+def descargar_a_temporal(url, sufijo=''):
+    """Descargar un archivo a disco por bloques. Devuelve su ruta o None"""
+    ruta = None
+    try:
+        with cronometro('descarga_archivo'):
+            with requests.get(url, timeout=30, stream=True) as response:
+                if response.status_code != 200:
+                    return None
+                with tempfile.NamedTemporaryFile(suffix=sufijo, delete=False) as destino:
+                    ruta = destino.name
+                    for bloque in response.iter_content(chunk_size=64 * 1024):
+                        destino.write(bloque)
+        return ruta
+    except Exception as e:
+        print(f"❌ Error descargando {url}: {e}")
+        if ruta:
+            os.remove(ruta)
+        return None
+
+def extraer_texto_pdf(ruta, max_paginas=PDF_MAX_PAGINAS):
+    """Texto de un PDF en disco. Se ejecuta en el pool de procesos.
+
+    Devuelve (texto, segundos) para que el proceso principal registre la
+    duración en sus métricas.
+    """
+    inicio = time.perf_counter()
+    paginas = []
+    # Con una ruta pypdf lee el fichero entero en memoria; con el fichero
+    # abierto va leyendo por seek solo los objetos que necesita
+    with open(ruta, 'rb') as fichero:
+        lector = PdfReader(fichero)
+        for i in range(min(len(lector.pages), max_paginas)):
+            paginas.append(lector.pages[i].extract_text() or '')
+    # PostgreSQL no acepta NUL en columnas de texto
+    texto = limpiar_texto(' '.join(paginas).replace('\x00', ''))[:PDF_MAX_CARACTERES]
+    return texto, time.perf_counter() - inicio
+
+def _extraer_texto_async(ruta):
+    """Mandar un PDF al pool de procesos, recreándolo si se rompió"""
+    global _ejecutor_pdf
+    for _ in range(2):
+        if _ejecutor_pdf is None:
+            # spawn y no fork: el pool de hilos de las imágenes ya está en marcha
+            _ejecutor_pdf = ProcessPoolExecutor(
+                max_workers=PROCESOS_PDF, mp_context=multiprocessing.get_context('spawn')
+            )
+        try:
+            return _ejecutor_pdf.submit(extraer_texto_pdf, ruta)
+        except BrokenProcessPool:
+            _ejecutor_pdf = None
+    return None
+
+def _reiniciar_pool_pdf():
+    """Matar los procesos del pool de PDFs (uno está colgado) para que se cree otro"""
+    global _ejecutor_pdf
+    ejecutor, _ejecutor_pdf = _ejecutor_pdf, None
+    if ejecutor is None:
+        return
+    for proceso in list(getattr(ejecutor, '_processes', {}).values()):
+        proceso.terminate()
+    ejecutor.shutdown(wait=False, cancel_futures=True)
+
 def limpiar_texto(texto):
     """Limpiar y normalizar texto"""
     if not texto:
@@ -112,10 +179,73 @@ def extraer_numero(texto):
     numeros = re.findall(r'[\d,.]+', texto.replace('.', '').replace(',', '.'))
     return float(numeros[0]) if numeros else 0
 
+# Campos de cada lote (tabla lotes); sin secciones de lote, el único lote
+# es la propia subasta
+CAMPOS_LOTE = (
+    'descripcion', 'referencia_catastral', 'localidad', 'direccion', 'valor_tasacion',
+    'valor_subasta', 'tramos_pujas', 'puja_minima', 'importe_deposito'
+)
+_RE_TITULO_LOTE = re.compile(r'^\s*Lote\s+(\d+)', re.IGNORECASE)
+_TITULOS = ['h2', 'h3', 'h4']
+
+def parsear_lotes(soup):
+    """Secciones "Lote N" de la página de detalle, cada una con su tabla.
+
+    Devuelve (lotes, ids de sus tablas) para que la ficha de la subasta no
+    lea las filas de los lotes.
+    """
+    lotes = []
+    tablas = set()
+    numeros = set()
+    for titulo in soup.find_all(_TITULOS, string=_RE_TITULO_LOTE):
+        tabla = titulo.find_next('table')
+        if tabla is None or tabla.find_previous(_TITULOS) is not titulo:
+            continue
+        tablas.add(id(tabla))
+        numero = int(_RE_TITULO_LOTE.match(titulo.string).group(1))
+        if numero in numeros:
+            continue
+        numeros.add(numero)
+        
+        lote = {'numero': numero, 'descripcion': '', 'referencia_catastral': '', 'localidad': '',
+                'direccion': '', 'valor_tasacion': 0, 'valor_subasta': 0, 'tramos_pujas': 0,
+                'puja_minima': 0, 'importe_deposito': 0}
+        for fila in tabla.find_all('tr'):
+            celdas = fila.find_all(['td', 'th'])
+            if len(celdas) < 2:
+                continue
+            campo = limpiar_texto(celdas[0].text).lower()
+            valor = limpiar_texto(celdas[1].text)
+            
+            if 'descripción' in campo:
+                lote['descripcion'] = valor
+            elif 'referencia catastral' in campo:
+                lote['referencia_catastral'] = valor
+            elif 'localidad' in campo:
+                lote['localidad'] = valor
+            elif 'dirección' in campo:
+                lote['direccion'] = valor
+            elif 'valor de tasación' in campo or 'valor tasación' in campo:
+                lote['valor_tasacion'] = extraer_numero(valor)
+            elif 'valor subasta' in campo or 'valor de subasta' in campo:
+                lote['valor_subasta'] = extraer_numero(valor)
+            elif 'tramo' in campo:
+                lote['tramos_pujas'] = extraer_numero(valor)
+            elif 'puja mínima' in campo:
+                lote['puja_minima'] = extraer_numero(valor)
+            elif 'depósito' in campo:
+                lote['importe_deposito'] = extraer_numero(valor)
+        lotes.append(lote)
+    
+    return lotes, tablas
+
 def parsear_detalle_subasta(url_detalle):
     """Extraer información detallada de una subasta"""
     try:
-        response = requests.get(url_detalle, timeout=30)
+        with cronometro('detalle'):
+            response = requests.get(url_detalle, timeout=30)
+        metricas.incrementar('detalles')
+        inicio_parseo = time.perf_counter()
         soup = BeautifulSoup(response.content, 'lxml')
         
         datos = {
@@ -158,9 +288,13 @@ def parsear_detalle_subasta(url_detalle):
         if titulo_elem:
             datos['titulo'] = limpiar_texto(titulo_elem.text)
         
+        lotes, tablas_lotes = parsear_lotes(soup)
+        
         # Extraer campos de la tabla de información
         filas = soup.find_all('tr')
         for fila in filas:
+            if id(fila.find_parent('table')) in tablas_lotes:
+                continue
             celdas = fila.find_all(['td', 'th'])
             if len(celdas) >= 2:
                 campo = limpiar_texto(celdas[0].text).lower()
@@ -217,11 +351,18 @@ def parsear_detalle_subasta(url_detalle):
                     except:
                         pass
         
+        if not lotes:
+            lotes = [dict({c: datos[c] for c in CAMPOS_LOTE}, numero=1)]
+        datos['lotes_detalle'] = lotes
+        
+        metricas.observar('parseo', time.perf_counter() - inicio_parseo)
+        
         # Geocodificar dirección si existe
         if datos['direccion']:
             try:
                 direccion_completa = f"{datos['direccion']}, {datos['localidad']}, {datos['provincia']}, España"
-                coords = geocodificar_direccion(direccion_completa)
+                with cronometro('geocodificacion'):
+                    coords = geocodificar_direccion(direccion_completa)
                 if coords:
                     datos['latitud'] = coords['lat']
                     datos['longitud'] = coords['lng']
@@ -231,13 +372,14 @@ def parsear_detalle_subasta(url_detalle):
         return datos
         
     except Exception as e:
+        metricas.incrementar('errores')
         print(f"❌ Error parseando detalle: {e}")
         return None
 
 def geocodificar_direccion(direccion):
     """Obtener coordenadas de Google Maps (Nominatim como alternativa gratuita)"""
     try:
-        url = "https://nominatim.openstreetmap.org/search"
+        url = NOMINATIM_URL
         params = {
             'q': direccion,
             'format': 'json',
@@ -257,61 +399,148 @@ def geocodificar_direccion(direccion):
         pass
     return None
 
+def _pool_imagenes():
+    """Pool de hilos compartido para procesar fotos"""
+    global _ejecutor_imagenes
+    if _ejecutor_imagenes is None:
+        _ejecutor_imagenes = ThreadPoolExecutor(max_workers=HILOS_IMAGENES, thread_name_prefix='imagenes')
+    return _ejecutor_imagenes
+
+def generar_derivados(archivo_bytes):
+    """Versiones WebP reducidas de una foto: {'medium': bytes, 'thumb': bytes}"""
+    derivados = {}
+    with Image.open(io.BytesIO(archivo_bytes)) as original:
+        # En JPEG, decodificar ya reducido (escalado DCT) ahorra casi todo el coste
+        lado_maximo = max(DERIVADOS.values())
+        original.draft('RGB', (lado_maximo, lado_maximo))
+        imagen = ImageOps.exif_transpose(original)
+        if imagen.mode not in ('RGB', 'RGBA'):
+            imagen = imagen.convert('RGB')
+        
+        # De mayor a menor, cada versión parte de la anterior
+        for variante, lado in sorted(DERIVADOS.items(), key=lambda item: -item[1]):
+            imagen = imagen.copy()
+            imagen.thumbnail((lado, lado), Image.LANCZOS)
+            salida = io.BytesIO()
+            imagen.save(salida, 'WEBP', quality=80)
+            derivados[variante] = salida.getvalue()
+    
+    return derivados
+
+def procesar_imagen(subasta_id, idx, src):
+    """Descargar una foto y subirla a S3 junto con sus miniaturas"""
+    archivo = descargar_archivo(src)
+    if not archivo:
+        return None
+    
+    extension = src.split('.')[-1].split('?')[0]
+    nombre = f"imagen_{idx + 1}.{extension}"
+    ruta_s3 = f"subastas/{subasta_id}/imagenes/{nombre}"
+    
+    url_s3 = subir_bytes(archivo, ruta_s3, f'image/{extension}')
+    if not url_s3:
+        return None
+    
+    imagen_data = {
+        'nombre': nombre,
+        'url_original': src,
+        'url_s3': url_s3,
+        'size_bytes': len(archivo),
+        'url_thumb': None,
+        'url_medium': None
+    }
+    
+    try:
+        with cronometro('derivados'):
+            derivados = generar_derivados(archivo)
+        base = nombre.rsplit('.', 1)[0]
+        for variante, contenido in derivados.items():
+            ruta_derivado = f"subastas/{subasta_id}/imagenes/{variante}/{base}.webp"
+            imagen_data[f'url_{variante}'] = subir_bytes(contenido, ruta_derivado, 'image/webp')
+    except Exception as e:
+        print(f"⚠️ Sin miniaturas para {src}: {e}")
+    
+    return imagen_data
+
 def descargar_archivos_subasta(subasta_id, soup):
     """Descargar imágenes y documentos de una subasta"""
     imagenes = []
     documentos = []
     
-    # Buscar imágenes
+    # Las imágenes (descarga, subida y miniaturas) van al pool de hilos
+    # mientras este hilo se ocupa de los documentos
     imgs = soup.find_all('img', class_=re.compile('foto|imagen|gallery'))
+    futuros = []
     for idx, img in enumerate(imgs):
         src = img.get('src')
         if src and not src.startswith('data:'):
             if not src.startswith('http'):
                 src = f"{BASE_URL}/{src}"
-            
-            archivo = descargar_archivo(src)
-            if archivo:
-                extension = src.split('.')[-1].split('?')[0]
-                nombre = f"imagen_{idx + 1}.{extension}"
-                ruta_s3 = f"subastas/{subasta_id}/imagenes/{nombre}"
-                
-                url_s3 = subir_archivo_s3(archivo, ruta_s3, f'image/{extension}')
-                if url_s3:
-                    imagen_data = {
-                        'nombre': nombre,
-                        'url_original': src,
-                        'url_s3': url_s3,
-                        'size_bytes': len(archivo)
-                    }
-                    imagenes.append(imagen_data)
-                    insertar_imagen(subasta_id, imagen_data)
+            futuros.append(_pool_imagenes().submit(procesar_imagen, subasta_id, idx, src))
+    metricas.fijar_cola('imagenes', len(futuros))
     
-    # Buscar documentos PDF
+    # Buscar documentos PDF: se descargan a disco y el texto se extrae en
+    # otros procesos mientras seguimos con el resto
     links = soup.find_all('a', href=re.compile(r'\.pdf|documento', re.I))
+    extracciones = []
     for idx, link in enumerate(links):
+        metricas.fijar_cola('archivos', len(links) - idx)
         href = link.get('href')
         if href:
             if not href.startswith('http'):
                 href = f"{BASE_URL}/{href}"
             
-            archivo = descargar_archivo(href)
-            if archivo:
+            ruta_local = descargar_a_temporal(href, '.pdf')
+            if ruta_local:
                 nombre = link.text.strip() or f"documento_{idx + 1}.pdf"
                 nombre = re.sub(r'[^\w\s-]', '', nombre)[:100] + '.pdf'
                 ruta_s3 = f"subastas/{subasta_id}/documentos/{nombre}"
                 
-                url_s3 = subir_archivo_s3(archivo, ruta_s3, 'application/pdf')
+                url_s3 = subir_fichero(ruta_local, ruta_s3, 'application/pdf')
                 if url_s3:
                     doc_data = {
                         'nombre': nombre,
                         'tipo': 'pdf',
                         'url_original': href,
                         'url_s3': url_s3,
-                        'size_bytes': len(archivo)
+                        'size_bytes': os.path.getsize(ruta_local),
+                        'texto': None
                     }
-                    documentos.append(doc_data)
-                    insertar_documento(subasta_id, doc_data)
+                    futuro = None
+                    if doc_data['size_bytes'] <= PDF_MAX_BYTES_TEXTO:
+                        futuro = _extraer_texto_async(ruta_local)
+                    else:
+                        print(f"⚠️ PDF demasiado grande para extraer texto: {href}")
+                    extracciones.append((doc_data, ruta_local, futuro))
+                else:
+                    os.remove(ruta_local)
+    metricas.fijar_cola('archivos', 0)
+    
+    for doc_data, ruta_local, futuro in extracciones:
+        try:
+            if futuro:
+                doc_data['texto'], segundos = futuro.result(timeout=PDF_TIMEOUT)
+                metricas.observar('extraccion_texto', segundos)
+        except TiempoAgotado:
+            print(f"⚠️ Extracción de texto sin terminar tras {PDF_TIMEOUT:.0f}s: {doc_data['url_original']}")
+            metricas.incrementar('pdf_timeouts')
+            _reiniciar_pool_pdf()
+        except Exception as e:
+            print(f"⚠️ Sin texto para {doc_data['url_original']}: {e}")
+        finally:
+            os.remove(ruta_local)
+        documentos.append(doc_data)
+        with cronometro('db_flush'):
+            insertar_documento(subasta_id, doc_data)
+    
+    for pendientes, futuro in enumerate(futuros):
+        metricas.fijar_cola('imagenes', len(futuros) - pendientes)
+        imagen_data = futuro.result()
+        if imagen_data:
+            imagenes.append(imagen_data)
+            with cronometro('db_flush'):
+                insertar_imagen(subasta_id, imagen_data)
+    metricas.fijar_cola('imagenes', 0)
     
     return imagenes, documentos
 
@@ -329,7 +558,9 @@ def buscar_subastas(provincia, tipo_bien, tipo_subasta, estado):
             'dato[3]': estado
         }
         
-        response = requests.get(SEARCH_URL, params=params, timeout=30)
+        with cronometro('busqueda'):
+            response = requests.get(SEARCH_URL, params=params, timeout=30)
+        metricas.incrementar('busquedas')
         soup = BeautifulSoup(response.content, 'lxml')
         
         # Buscar enlaces a detalles de subastas
@@ -347,50 +578,107 @@ def buscar_subastas(provincia, tipo_bien, tipo_subasta, estado):
         return urls_detalle
         
     except Exception as e:
+        metricas.incrementar('errores')
         print(f"❌ Error en búsqueda: {e}")
         return []
 
-def scraping_completo():
-    """Realizar scraping completo del BOE"""
+def scraping_completo(estados=None, progreso=None):
+    """Realizar scraping completo del BOE.
+
+    estados limita las búsquedas a esos estados (por defecto todos). Si se
+    pasa progreso, se llama tras cada búsqueda con un dict de avance; puede
+    lanzar una excepción para detener el scraping.
+    """
+    estados = estados or ESTADOS
     print("🚀 Iniciando scraping completo del BOE...")
     total_subastas = 0
+    totales = {'insertada': 0, 'actualizada': 0, 'sin_cambios': 0}
+    busquedas_totales = len(PROVINCIAS) * len(TIPOS_BIEN) * len(TIPOS_SUBASTA) * len(estados)
+    busquedas_hechas = 0
     
     for provincia in PROVINCIAS:
         print(f"\n📍 Scraping provincia: {provincia}")
         
         for tipo_bien in TIPOS_BIEN:
             for tipo_subasta in TIPOS_SUBASTA:
-                for estado in ESTADOS:
+                for estado in estados:
                     print(f"  🔍 {tipo_bien} | {tipo_subasta} | {estado}")
                     
                     urls = buscar_subastas(provincia, tipo_bien, tipo_subasta, estado)
+                    lote = []
+                    resultados = {'insertada': 0, 'actualizada': 0, 'sin_cambios': 0}
                     
-                    for url in urls:
+                    for pendientes, url in enumerate(urls):
+                        metricas.fijar_cola('detalles', len(urls) - pendientes)
                         try:
                             print(f"    ⬇️  Procesando: {url[:80]}...")
                             
                             # Parsear detalle
                             datos = parsear_detalle_subasta(url)
                             if datos and datos['id']:
-                                # Guardar en base de datos
-                                if insertar_subasta(datos):
+                                # Guardar en base de datos (solo si algo ha cambiado)
+                                with cronometro('db_flush'):
+                                    resultado, anterior = insertar_subasta(datos)
+                                if resultado in resultados:
+                                    resultados[resultado] += 1
+                                    metricas.incrementar(f'subastas_{resultado}')
+                                if resultado in ('insertada', 'actualizada'):
                                     total_subastas += 1
-                                    
-                                    # Descargar archivos
-                                    response = requests.get(url, timeout=30)
+                                    metricas.incrementar('subastas_guardadas')
+                                    lote.append(datos)
+                                    if anterior:
+                                        lote.append(anterior)
+                                
+                                if resultado == 'insertada':
+                                    # Los archivos solo se descargan la primera vez
+                                    with cronometro('detalle'):
+                                        response = requests.get(url, timeout=30)
                                     soup = BeautifulSoup(response.content, 'lxml')
                                     descargar_archivos_subasta(datos['id'], soup)
                                     
-                                    print(f"    ✅ Subasta guardada: {datos['id']}")
+                                    print(f"    ✅ Subasta nueva: {datos['id']}")
+                                elif resultado == 'actualizada':
+                                    print(f"    🔄 Subasta actualizada: {datos['id']}")
                             
-                            time.sleep(1)
+                            time.sleep(PAUSA_DETALLE)
                             
                         except Exception as e:
+                            metricas.incrementar('errores')
                             print(f"    ❌ Error: {e}")
                     
-                    time.sleep(2)
+                    metricas.fijar_cola('detalles', 0)
+                    for clave, cantidad in resultados.items():
+                        totales[clave] += cantidad
+                    if urls:
+                        print(f"    📊 {resultados['insertada']} nuevas, {resultados['actualizada']} actualizadas, "
+                              f"{resultados['sin_cambios']} sin cambios")
+                    
+                    # Actualizar el resumen de /api/stats con lo que ha cambiado
+                    if lote:
+                        with cronometro('db_flush'):
+                            refrescar_estadisticas(lote)
+                    
+                    busquedas_hechas += 1
+                    if progreso:
+                        progreso({
+                            'busquedas_hechas': busquedas_hechas,
+                            'busquedas_totales': busquedas_totales,
+                            'subastas': total_subastas,
+                            'insertadas': totales['insertada'],
+                            'actualizadas': totales['actualizada'],
+                            'sin_cambios': totales['sin_cambios'],
+                            'provincia': provincia
+                        })
+                    
+                    time.sleep(PAUSA_BUSQUEDA)
     
-    print(f"\n✅ Scraping completo finalizado. Total: {total_subastas} subastas")
+    print(f"\n✅ Scraping completo finalizado. {totales['insertada']} nuevas, "
+          f"{totales['actualizada']} actualizadas, {totales['sin_cambios']} sin cambios")
 
 if __name__ == '__main__':
-    scraping_completo()
+    # Por la cola y con el lock del worker, como cualquier otra ejecución: el
+    # cursor de subastas_cambios no admite dos escritores a la vez
+    from tareas import encolar_scraping, ejecutar_pendiente
+    encolar_scraping()
+    if not ejecutar_pendiente():
+        print("⏳ Otro proceso tiene el lock del scraping; la ejecución queda en manos del worker")
@@ -0,0 +1,39 @@
+"""Serialización JSON de las respuestas de la API con orjson"""
+from decimal import Decimal
+import orjson
+from flask import Response
+
+def _valor_por_defecto(valor):
+    """Convertir los tipos que orjson no conoce (Decimal de PostgreSQL)"""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+def a_json(payload):
+    """Serializar a bytes JSON; fechas y datetimes salen en ISO 8601"""
+    return orjson.dumps(payload, default=_valor_por_defecto)
+
+def respuesta_json(payload, status=200):
+    """Respuesta Flask con el JSON ya serializado"""
+    return Response(a_json(payload), status=status, mimetype='application/json')
+
+def respuesta_json_cruda(texto, status=200):
+    """Respuesta Flask para un documento JSON generado por PostgreSQL"""
+    return Response(texto, status=status, mimetype='application/json')
+
+def serializar_subasta(fila):
+    """Preparar una fila de subastas para la API.
+
+    Los Decimal y las fechas se dejan tal cual: los convierte orjson al
+    serializar, sin recorrer los campos fila a fila en Python.
+    """
+    subasta = dict(fila)
+
+    # Coordenadas en formato esperado por el frontend
+    if subasta.get('latitud') and subasta.get('longitud'):
+        subasta['coordenadas'] = {
+            'lat': float(subasta['latitud']),
+            'lng': float(subasta['longitud'])
+        }
+
+    return subasta
@@ -13,6 +13,64 @@ export default function App() {
   const [downloadingExcel, setDownloadingExcel] = useState(false);
   const [showAdmin, setShowAdmin] = useState(false);
   const [scrapingStatus, setScrapingStatus] = useState('');
+  const [cursorCambios, setCursorCambios] = useState(null);
+  const [filtrosActivos, setFiltrosActivos] = useState(false);
+
+  // Cambios en vivo desde el último listado: se actualizan las subastas
+  // mostradas y, sin filtros, se añaden las nuevas. Si el servidor rechaza
+  // el stream (503, demasiados abiertos) se consulta /changes cada 30 s
+  useEffect(() => {
+    if (cursorCambios === null) return undefined;
+    let cursor = cursorCambios;
+    let sondeo = null;
+
+    const aplicarCambios = (cambios) => {
+      setSubastas((actuales) => {
+        let lista = [...actuales];
+        cambios.forEach((cambio) => {
+          const indice = lista.findIndex((s) => s.id === cambio.id);
+          if (cambio.tipo === 'archivada' || !cambio.subasta) {
+            if (indice >= 0) lista.splice(indice, 1);
+          } else if (indice >= 0) {
+            lista[indice] = cambio.subasta;
+          } else if (!filtrosActivos) {
+            lista = [cambio.subasta, ...lista];
+          }
+        });
+        return lista;
+      });
+    };
+
+    const consultarCambios = async () => {
+      try {
+        const response = await fetch(`${API_URL}/api/subastas/changes?since=${cursor}`);
+        const data = await response.json();
+        if (data.success) {
+          cursor = data.cursor;
+          aplicarCambios(data.cambios);
+        }
+      } catch (error) {
+        console.error('Error consultando cambios:', error);
+      }
+    };
+
+    const stream = new EventSource(`${API_URL}/api/subastas/stream?since=${cursorCambios}`);
+    stream.addEventListener('cambios', (evento) => {
+      const data = JSON.parse(evento.data);
+      cursor = data.cursor;
+      aplicarCambios(data.cambios);
+    });
+    stream.onerror = () => {
+      // Tras un error HTTP el navegador no reconecta: pasar a sondeo
+      if (stream.readyState === EventSource.CLOSED && sondeo === null) {
+        sondeo = setInterval(consultarCambios, 30000);
+      }
+    };
+    return () => {
+      stream.close();
+      if (sondeo !== null) clearInterval(sondeo);
+    };
+  }, [cursorCambios, filtrosActivos]);
 
   const handleSearch = async () => {
     setLoading(true);
@@ -27,6 +85,8 @@ export default function App() {
       
       if (data.success) {
         setSubastas(data.data);
+        setFiltrosActivos(Boolean(searchTerm || filters.tipo || filters.provincia));
+        setCursorCambios(data.cursor ?? null);
       } else {
         alert('Error al obtener subastas');
       }
@@ -369,10 +429,11 @@ export default function App() {
                           {s.imagenes.map((img, idx) => (
                             <div key={idx}>
                               <img
-                                src={img.url}
+                                src={`${API_URL}/api/adjuntos/imagen/${img.id}?variante=thumb`}
                                 alt={img.nombre}
                                 className="w-full h-32 object-cover rounded-lg border-2 border-gray-200 cursor-pointer hover:border-blue-500"
-                                onClick={() => window.open(img.url, '_blank')}
+                                loading="lazy"
+                                onClick={() => window.open(`${API_URL}/api/adjuntos/imagen/${img.id}`, '_blank')}
                               />
                               <p className="text-xs text-gray-600 mt-1 truncate">{img.nombre}</p>
                             </div>
@@ -389,7 +450,13 @@ export default function App() {
                         </h4>
                         <div className="grid grid-cols-1 md:grid-cols-2 gap-2">
                           {s.documentos.map((doc, idx) => (
-                            <div key={idx} className="flex items-center gap-3 bg-gray-50 border rounded-lg p-3">
+                            <a
+                              key={idx}
+                              href={`${API_URL}/api/adjuntos/documento/${doc.id}`}
+                              target="_blank"
+                              rel="noopener noreferrer"
+                              className="flex items-center gap-3 bg-gray-50 border rounded-lg p-3 hover:border-blue-500"
+                            >
                               <div className="bg-red-100 p-2 rounded">
                                 <FileText className="w-5 h-5 text-red-600" />
                               </div>
@@ -397,7 +464,7 @@ export default function App() {
                                 <p className="text-sm font-medium">{doc.nombre}</p>
                                 <p className="text-xs text-gray-500">{doc.size}</p>
                               </div>
-                            </div>
+                            </a>
                           ))}
                         </div>
                       </div>
@@ -0,0 +1,307 @@
+"""Gestor de ejecuciones del scraper.
+
+La API solo encola ejecuciones en la tabla scraping_ejecuciones; las corre
+un proceso worker aparte (`python tareas.py`, ver Procfile). Un advisory
+lock de PostgreSQL garantiza que nunca haya dos scrapings a la vez aunque
+haya varios workers, y el progreso y la cancelación pasan por la misma
+tabla, así que cualquier proceso de la API puede consultarlos.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import psycopg2
+from psycopg2.extras import RealDictCursor
+import metricas
+from database import DATABASE_URL, get_db_connection, archivar_subastas
+
+# Clave del advisory lock que protege el scraping (arbitraria pero fija)
+LOCK_SCRAPING = 7270736901
+
+# Cada cuánto mira el worker si hay trabajo pendiente
+INTERVALO_SONDEO = int(os.getenv('SCRAPING_SONDEO_SEGUNDOS', 30))
+
+# Cada cuánto se publican las métricas mientras corre un scraping
+INTERVALO_METRICAS = float(os.getenv('SCRAPING_METRICAS_SEGUNDOS', 15))
+
+# Horas entre ejecuciones incrementales programadas (0 = desactivado)
+INTERVALO_INCREMENTAL = float(os.getenv('SCRAPING_INTERVALO_HORAS', 0))
+
+# Archivado de subastas concluidas: antigüedad mínima y cada cuánto se hace
+ARCHIVO_DIAS = int(os.getenv('ARCHIVO_DIAS', 90))
+ARCHIVO_INTERVALO_HORAS = float(os.getenv('ARCHIVO_INTERVALO_HORAS', 24))
+
+ESTADOS_ACTIVOS = ('pendiente', 'en_curso')
+
+_ultimo_archivado = 0.0
+
+class ScrapingCancelado(Exception):
+    """Se ha pedido cancelar la ejecución en curso"""
+
+def encolar_scraping(tipo='completo'):
+    """Encolar una ejecución. Devuelve su id, o None si ya hay una activa"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        # El índice único parcial idx_scraping_activo admite una sola activa
+        cur.execute('''
+            INSERT INTO scraping_ejecuciones (tipo, estado)
+            VALUES (%s, 'pendiente')
+            ON CONFLICT DO NOTHING
+            RETURNING id
+        ''', (tipo,))
+        fila = cur.fetchone()
+        conn.commit()
+        return fila['id'] if fila else None
+    finally:
+        cur.close()
+        conn.close()
+
+def obtener_estado_scraping():
+    """Última ejecución del scraper con su progreso"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    cur.execute('SELECT * FROM scraping_ejecuciones ORDER BY id DESC LIMIT 1')
+    ejecucion = cur.fetchone()
+
+    cur.close()
+    conn.close()
+
+    return ejecucion
+
+def cancelar_scraping():
+    """Pedir la cancelación de la ejecución activa. Devuelve su id o None"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        # Las pendientes se cancelan directamente; las que están en curso
+        # las detiene el worker al terminar la búsqueda actual
+        cur.execute('''
+            UPDATE scraping_ejecuciones
+            SET cancelar = TRUE,
+                estado = CASE WHEN estado = 'pendiente' THEN 'cancelado' ELSE estado END,
+                fin = CASE WHEN estado = 'pendiente' THEN CURRENT_TIMESTAMP ELSE fin END
+            WHERE estado IN %s
+            RETURNING id
+        ''', (ESTADOS_ACTIVOS,))
+        fila = cur.fetchone()
+        conn.commit()
+        return fila['id'] if fila else None
+    finally:
+        cur.close()
+        conn.close()
+
+def _actualizar_ejecucion(ejecucion_id, terminar=False, **campos):
+    """Actualizar columnas de una ejecución y devolver si se pidió cancelar"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        asignaciones = ', '.join(f"{campo} = %s" for campo in campos)
+        if terminar:
+            asignaciones += ', fin = CURRENT_TIMESTAMP'
+        valores = [json.dumps(v) if isinstance(v, dict) else v for v in campos.values()]
+        cur.execute(
+            f'UPDATE scraping_ejecuciones SET {asignaciones} WHERE id = %s RETURNING cancelar',
+            valores + [ejecucion_id]
+        )
+        fila = cur.fetchone()
+        conn.commit()
+        return bool(fila and fila['cancelar'])
+    finally:
+        cur.close()
+        conn.close()
+
+def _conexion_lock():
+    """Conexión para el advisory lock, fuera del pool (como la de LISTEN en
+    notificaciones.py): queda ocupada toda la ejecución, horas en un
+    scraping, y le quitaría una plaza al resto del proceso"""
+    conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    conn.autocommit = True
+    return conn
+
+def ejecutar_pendiente():
+    """Ejecutar la ejecución pendiente más antigua, si la hay.
+
+    Devuelve True si ha corrido algo. Si otro worker tiene el lock no hace
+    nada.
+    """
+    from scraper import scraping_completo, ESTADOS_VIVOS
+
+    lock_conn = _conexion_lock()
+    lock_cur = lock_conn.cursor()
+
+    try:
+        lock_cur.execute('SELECT pg_try_advisory_lock(%s) AS obtenido', (LOCK_SCRAPING,))
+        if not lock_cur.fetchone()['obtenido']:
+            return False
+
+        # Con el lock en la mano, cualquier ejecución 'en_curso' es de un
+        # worker que murió (reinicio del dyno, despliegue...)
+        lock_cur.execute('''
+            UPDATE scraping_ejecuciones
+            SET estado = 'error', error = 'Interrumpido', fin = CURRENT_TIMESTAMP
+            WHERE estado = 'en_curso'
+        ''')
+
+        lock_cur.execute('''
+            UPDATE scraping_ejecuciones
+            SET estado = 'en_curso', inicio = CURRENT_TIMESTAMP
+            WHERE id = (
+                SELECT id FROM scraping_ejecuciones
+                WHERE estado = 'pendiente'
+                ORDER BY id
+                LIMIT 1
+            )
+            RETURNING id, tipo
+        ''')
+        ejecucion = lock_cur.fetchone()
+        if not ejecucion:
+            return False
+
+        ejecucion_id = ejecucion['id']
+        print(f"🚀 Ejecución {ejecucion_id} ({ejecucion['tipo']}) iniciada")
+
+        def progreso(avance):
+            if _actualizar_ejecucion(ejecucion_id, progreso=avance):
+                raise ScrapingCancelado()
+
+        # Las colas entre etapas solo tienen tamaño con trabajo en vuelo (entre
+        # búsquedas vuelven a 0), así que las métricas se publican por tiempo
+        # desde otro hilo y no al terminar cada búsqueda
+        parar_publicacion = threading.Event()
+
+        def publicar_metricas():
+            while not parar_publicacion.wait(INTERVALO_METRICAS):
+                try:
+                    _actualizar_ejecucion(ejecucion_id, metricas=metricas.instantanea())
+                except Exception as e:
+                    print(f"⚠️ No se pudieron publicar las métricas: {e}")
+
+        def terminar(estado, **campos):
+            parar_publicacion.set()
+            publicador.join()
+            _actualizar_ejecucion(ejecucion_id, estado=estado, terminar=True,
+                                  metricas=metricas.instantanea(), **campos)
+
+        metricas.reiniciar()
+        publicador = threading.Thread(target=publicar_metricas, name='metricas', daemon=True)
+        publicador.start()
+        try:
+            estados = ESTADOS_VIVOS if ejecucion['tipo'] == 'incremental' else None
+            scraping_completo(estados=estados, progreso=progreso)
+            terminar('completado')
+            print(f"✅ Ejecución {ejecucion_id} completada")
+        except ScrapingCancelado:
+            terminar('cancelado')
+            print(f"🛑 Ejecución {ejecucion_id} cancelada")
+        except Exception as e:
+            terminar('error', error=str(e))
+            print(f"❌ Ejecución {ejecucion_id} fallida: {e}")
+
+        return True
+    finally:
+        lock_cur.execute('SELECT pg_advisory_unlock_all()')
+        lock_cur.close()
+        lock_conn.close()
+
+def obtener_metricas_scraping():
+    """Métricas de la última ejecución que las haya publicado"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    cur.execute('''
+        SELECT id, estado, metricas
+        FROM scraping_ejecuciones
+        WHERE metricas IS NOT NULL
+        ORDER BY id DESC
+        LIMIT 1
+    ''')
+    ejecucion = cur.fetchone()
+
+    cur.close()
+    conn.close()
+
+    return ejecucion
+
+def programar_incremental():
+    """Encolar una ejecución incremental si toca según SCRAPING_INTERVALO_HORAS"""
+    if INTERVALO_INCREMENTAL <= 0:
+        return None
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    cur.execute('''
+        SELECT COUNT(*) AS recientes
+        FROM scraping_ejecuciones
+        WHERE creado > CURRENT_TIMESTAMP - %s * INTERVAL '1 hour'
+    ''', (INTERVALO_INCREMENTAL,))
+    recientes = cur.fetchone()['recientes']
+
+    cur.close()
+    conn.close()
+
+    if recientes:
+        return None
+    return encolar_scraping('incremental')
+
+def archivar_con_lock(esperar=False):
+    """Archivar subastas concluidas con el lock del scraping.
+
+    El cursor de subastas_cambios solo sigue el orden de commit si hay un
+    único escritor, así que el archivado nunca coincide con un scraping.
+    Sin esperar, devuelve None si el lock lo tiene otro proceso.
+    """
+    lock_conn = _conexion_lock()
+    lock_cur = lock_conn.cursor()
+
+    try:
+        if esperar:
+            lock_cur.execute('SELECT pg_advisory_lock(%s)', (LOCK_SCRAPING,))
+        else:
+            lock_cur.execute('SELECT pg_try_advisory_lock(%s) AS obtenido', (LOCK_SCRAPING,))
+            if not lock_cur.fetchone()['obtenido']:
+                return None
+        return archivar_subastas(ARCHIVO_DIAS)
+    finally:
+        lock_cur.execute('SELECT pg_advisory_unlock_all()')
+        lock_cur.close()
+        lock_conn.close()
+
+def archivar_si_toca():
+    """Archivar subastas concluidas cada ARCHIVO_INTERVALO_HORAS"""
+    global _ultimo_archivado
+    if ARCHIVO_INTERVALO_HORAS <= 0:
+        return 0
+    if _ultimo_archivado and time.monotonic() - _ultimo_archivado < ARCHIVO_INTERVALO_HORAS * 3600:
+        return 0
+    archivadas = archivar_con_lock()
+    if archivadas is None:
+        # Hay un scraping en otro worker: se reintenta en la siguiente vuelta
+        return 0
+    _ultimo_archivado = time.monotonic()
+    return archivadas
+
+def bucle_worker():
+    """Bucle principal del proceso worker"""
+    print("👷 Worker de scraping arrancado")
+    while True:
+        try:
+            archivar_si_toca()
+            programar_incremental()
+            if ejecutar_pendiente():
+                continue
+        except Exception as e:
+            print(f"❌ Error en el worker: {e}")
+        time.sleep(INTERVALO_SONDEO)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'archivar':
+        archivar_con_lock(esperar=True)
+    else:
+        bucle_worker()